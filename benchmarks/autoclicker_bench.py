@@ -0,0 +1,158 @@
+"""Офлайн-бенчмарк и проверка точности автокликера на синтетических экранах.
+
+Дисплей не нужен: кадры генерируются в памяти и подаются в MatchEngine
+через подставной бэкенд захвата, дальше работает обычный путь step().
+
+Запуск из корня проекта:
+    python -m benchmarks.autoclicker_bench --samples 30
+    python -m benchmarks.autoclicker_bench --json > bench_output.txt
+
+Для каждой комбинации разрешения, масштаба кнопки и шума выводятся
+перцентили задержки тика, пропускная способность и precision/recall
+при пороге 0.8. Каждый кадр ищется с нуля (без окна поиска и фиксации масштаба).
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from utils.match_engine import MatchEngine
+from utils.screen_capture import CaptureBackend
+
+RESOLUTIONS = [(1280, 720), (1920, 1080), (2560, 1440)]
+SCALES = [1.0, 1.25, 1.5]
+NOISE_LEVELS = [0, 6, 15]
+
+
+class SyntheticCapture(CaptureBackend):
+    """Бэкенд захвата, который отдает заранее сгенерированный кадр."""
+    name = 'synthetic'
+
+    def __init__(self, width, height):
+        super().__init__()
+        self.frame = np.zeros((height, width), dtype=np.uint8)
+
+    def screen_size(self):
+        return self.frame.shape[1], self.frame.shape[0]
+
+    def grab(self, region=None, out=None):
+        x, y, w, h = self._full_region(region)
+        gray = self._gray_view(w, h, out)
+        gray[...] = self.frame[y:y + h, x:x + w]
+        return gray
+
+
+def make_button():
+    button = np.full((36, 110), 60, dtype=np.uint8)
+    cv2.rectangle(button, (1, 1), (108, 34), 200, 2)
+    cv2.putText(button, 'Submit', (14, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 255, 2, cv2.LINE_AA)
+    return button
+
+
+def make_desktop(rng, width, height):
+    """Фон с градиентом, окнами и строками текста, чтобы было на что ложно срабатывать."""
+    gradient = np.linspace(30, 90, width, dtype=np.float32)
+    screen = np.tile(gradient, (height, 1)).astype(np.uint8)
+    for _ in range(width * height // 60000):
+        x, y = int(rng.integers(0, width - 50)), int(rng.integers(0, height - 30))
+        w, h = int(rng.integers(40, 400)), int(rng.integers(20, 250))
+        cv2.rectangle(screen, (x, y), (x + w, y + h), int(rng.integers(0, 255)), -1)
+    for _ in range(width * height // 20000):
+        x, y = int(rng.integers(0, width - 100)), int(rng.integers(15, height))
+        cv2.putText(screen, 'lorem ipsum', (x, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                    int(rng.integers(0, 255)), 1, cv2.LINE_AA)
+    return screen
+
+
+def make_sample(rng, desktop, button, scale, noise, positive):
+    screen = desktop.copy()
+    target = None
+    if positive:
+        size = (round(button.shape[1] * scale), round(button.shape[0] * scale))
+        scaled = cv2.resize(button, size, interpolation=cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA)
+        h, w = scaled.shape
+        x = int(rng.integers(0, screen.shape[1] - w))
+        y = int(rng.integers(0, screen.shape[0] - h))
+        screen[y:y + h, x:x + w] = scaled
+        target = (x, y)
+    if noise:
+        noisy = screen.astype(np.int16) + rng.normal(0, noise, screen.shape).astype(np.int16)
+        screen = np.clip(noisy, 0, 255).astype(np.uint8)
+    return screen, target
+
+
+def run_case(engine, capture, rng, button, resolution, scale, noise, samples, negative_ratio, tolerance):
+    desktop = make_desktop(rng, *resolution)
+    latencies = []
+    tp = fp = fn = 0
+    for _ in range(samples):
+        positive = rng.random() >= negative_ratio
+        capture.frame, target = make_sample(rng, desktop, button, scale, noise, positive)
+        engine.reset_search_window()
+        started = time.perf_counter()
+        hits, _ = engine.step()
+        latencies.append(time.perf_counter() - started)
+        hit = hits[0][1] if hits else None
+        if target is None:
+            fp += hit is not None
+        elif hit is not None and abs(hit[0] - target[0]) <= tolerance and abs(hit[1] - target[1]) <= tolerance:
+            tp += 1
+        else:
+            fn += 1
+            fp += hit is not None
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'resolution': f'{resolution[0]}x{resolution[1]}',
+        'scale': scale,
+        'noise': noise,
+        'samples': samples,
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 2),
+        'p90_ms': round(float(np.percentile(latencies_ms, 90)), 2),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 2),
+        'fps': round(float(samples / (latencies_ms.sum() / 1000)), 1),
+        'precision': round(tp / (tp + fp), 3) if tp + fp else 1.0,
+        'recall': round(tp / (tp + fn), 3) if tp + fn else 1.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетический бенчмарк автокликера')
+    parser.add_argument('--samples', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--negative-ratio', type=float, default=0.3)
+    parser.add_argument('--tolerance', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='вывести результаты в JSON')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    button = make_button()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        button_path = os.path.join(tmp, 'button.png')
+        cv2.imwrite(button_path, button)
+        templates_dir = os.path.join(tmp, 'templates')
+        engine = MatchEngine({'capture_backend': 'synthetic'}, os.path.join(tmp, 'templates.json'), templates_dir)
+        engine.library.add('submit', button_path)
+        for resolution in RESOLUTIONS:
+            capture = SyntheticCapture(*resolution)
+            engine.set_capture(capture)
+            for scale in SCALES:
+                for noise in NOISE_LEVELS:
+                    results.append(run_case(engine, capture, rng, button, resolution, scale, noise,
+                                            args.samples, args.negative_ratio, args.tolerance))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    header = f'{"resolution":<12}{"scale":>6}{"noise":>6}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}' \
+             f'{"fps":>8}{"prec":>7}{"recall":>8}'
+    print(header)
+    for r in results:
+        print(f'{r["resolution"]:<12}{r["scale"]:>6}{r["noise"]:>6}{r["p50_ms"]:>9}{r["p90_ms"]:>9}'
+              f'{r["p99_ms"]:>9}{r["fps"]:>8}{r["precision"]:>7}{r["recall"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Микробенчмарк бэкендов захвата экрана.
+
+Запуск из корня проекта (нужен рабочий дисплей):
+    python -m benchmarks.capture_bench --frames 100 --region 0 0 800 600
+
+Для каждого бэкенда выводит кадры в секунду и пиковый объем памяти, выделенной
+Python/NumPy за один кадр (по tracemalloc; внутренние буферы PIL и Xlib не учитываются).
+Строка legacy - старый путь pyautogui.screenshot() -> np.array -> cv2.cvtColor.
+"""
+import argparse
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from utils.screen_capture import CAPTURE_BACKENDS
+
+
+class LegacyCapture:
+    name = 'legacy'
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def grab(self, region=None):
+        screenshot = self._pyautogui.screenshot(region=region)
+        return cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2GRAY)
+
+    def close(self):
+        pass
+
+
+def measure(backend, frames, region):
+    backend.grab(region)  # прогрев: буферы и сегменты выделяются при первом кадре
+    tracemalloc.start()
+    allocated = []
+    started = time.perf_counter()
+    for _ in range(frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        backend.grab(region)
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    elapsed = time.perf_counter() - started
+    tracemalloc.stop()
+    return frames / elapsed, sum(allocated) / len(allocated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение бэкендов захвата экрана')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--region', type=int, nargs=4, metavar=('X', 'Y', 'W', 'H'))
+    args = parser.parse_args()
+    region = tuple(args.region) if args.region else None
+
+    factories = [LegacyCapture] + list(CAPTURE_BACKENDS.values())
+    print(f'{"backend":<12}{"fps":>10}{"bytes/frame":>16}')
+    for factory in factories:
+        try:
+            backend = factory()
+        except (OSError, ImportError) as e:
+            print(f'{factory.name:<12}недоступен: {e}')
+            continue
+        try:
+            fps, allocated = measure(backend, args.frames, region)
+            print(f'{backend.name:<12}{fps:>10.1f}{allocated:>16.0f}')
+        finally:
+            backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Офлайн-бенчмарк отрисовки эффектов счетчика.
+
+Дисплей не нужен: Qt запускается с QT_QPA_PLATFORM=offscreen, окно не
+показывается, кадры рисуются в QImage через QWidget.render().
+
+Запуск из корня проекта:
+    python -m benchmarks.effects_bench --frames 300
+    python -m benchmarks.effects_bench --json > effects_before.json
+
+Для каждого значения счетчика и частоты залпов прогоняется frames кадров по
+16 мс: залп (emit_sparks + emit_flames, как в AnimatedLabel.animate, но без
+анимаций Qt, которым нужен цикл событий), EffectsOverlay.update_sparks ровно
+на один шаг, AnimatedLabel.paintEvent и EffectsOverlay.paintEvent. Случайность
+частиц задается seed, уровень качества закреплен, поэтому одинаковые
+запуски рисуют одни и те же кадры и результаты до и после изменения можно
+сравнивать.
+
+Выводятся перцентили времени каждого этапа и кадра целиком. Второй проход
+тех же кадров идет под tracemalloc: пиковый объем памяти Python/NumPy за кадр,
+число сборок мусора поколения 0 (каждая - примерно 700 новых объектов) и
+сколько выделенных блоков осталось живыми после прогона.
+"""
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import argparse
+import contextlib
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PySide6.QtWidgets import QApplication, QMainWindow, QWidget
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QImage
+from ui.animated_label import AnimatedLabel
+from ui.effects_overlay import EffectsOverlay
+from ui.particle_system import EffectsQuality, QUALITY_NAMES, FRAME_MS
+
+VALUES = [0, 50, 250, 1000]
+# Залпов в секунду: одиночные нажатия, серия, зажатый Tab
+BURST_RATES = [1, 4, 10]
+# Размеры как в MainWindow: счетчик 82 px и три колонки кнопок по 40 px
+COUNTER_SIZE = 82
+WINDOW_SIZE = (COUNTER_SIZE + (40 + 2) * 3 + 37, 90)
+STAGES = ('update', 'label', 'overlay', 'total')
+
+
+class Scene:
+    """Окно как в MainWindow: счетчик, поверх него EffectsOverlay; кадры рисуются в QImage."""
+
+    def __init__(self, seed, quality, value):
+        random.seed(seed)
+        self.window = QMainWindow()
+        self.window.resize(*WINDOW_SIZE)
+        central = QWidget()
+        self.window.setCentralWidget(central)
+        central.setGeometry(0, 0, *WINDOW_SIZE)
+        self.overlay = EffectsOverlay(central)
+        self.overlay.setGeometry(central.rect())
+        self.label = AnimatedLabel('0', central, self.overlay)
+        self.label.setGeometry(2, (WINDOW_SIZE[1] - COUNTER_SIZE) // 2, COUNTER_SIZE, COUNTER_SIZE)
+        self.overlay.set_label(self.label)
+        self.overlay.raise_()
+        rng = np.random.default_rng(seed)
+        self.overlay.sparks.rng = rng
+        self.overlay.flames.rng = rng
+        self.overlay.quality = EffectsQuality(target_ms=FRAME_MS, adaptive=False)
+        self.overlay.quality.level = QUALITY_NAMES.index(quality)
+        center = self.label.geometry().center()
+        self.overlay.set_center(QPointF(center.x(), center.y()))
+        self.label.set_value(value)
+        self.label_image = self._image(self.label)
+        self.overlay_image = self._image(self.overlay)
+
+    @staticmethod
+    def _image(widget):
+        image = QImage(widget.width() * 2, widget.height() * 2, QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(2)
+        return image
+
+    def particles(self):
+        return len(self.overlay.sparks) + len(self.overlay.flames)
+
+    def frame(self, burst):
+        """Один кадр; возвращает время (update, label, overlay) в секундах."""
+        self.label_image.fill(Qt.transparent)
+        self.overlay_image.fill(Qt.transparent)
+        started = time.perf_counter()
+        if burst:
+            self.overlay.emit_sparks()
+            self.overlay.emit_flames()
+        # Ровно один шаг симуляции на кадр, независимо от реального времени
+        self.overlay.frame_clock.restart()
+        self.overlay._frame_backlog = 1.0
+        self.overlay.update_sparks()
+        updated = time.perf_counter()
+        self.label.render(self.label_image)
+        labeled = time.perf_counter()
+        self.overlay.render(self.overlay_image)
+        finished = time.perf_counter()
+        return updated - started, labeled - updated, finished - labeled
+
+    def close(self):
+        self.window.deleteLater()
+
+
+def run_frames(scene, frames, burst_every, timings=None):
+    counts = []
+    for frame in range(frames):
+        update, label, overlay = scene.frame(frame % burst_every == 0)
+        if timings is not None:
+            timings['update'].append(update)
+            timings['label'].append(label)
+            timings['overlay'].append(overlay)
+            timings['total'].append(update + label + overlay)
+        counts.append(scene.particles())
+    return counts
+
+
+def measure_allocations(scene, frames, burst_every):
+    tracemalloc.start()
+    blocks_before = len(tracemalloc.take_snapshot().traces)
+    collections_before = gc.get_stats()[0]['collections']
+    allocated = []
+    for frame in range(frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        scene.frame(frame % burst_every == 0)
+        allocated.append(tracemalloc.get_traced_memory()[1] - before)
+    collections = gc.get_stats()[0]['collections'] - collections_before
+    blocks = len(tracemalloc.take_snapshot().traces) - blocks_before
+    tracemalloc.stop()
+    return allocated, collections, blocks
+
+
+def run_case(value, burst_rate, frames, warmup, seed, quality):
+    burst_every = max(1, round(1000 / FRAME_MS / burst_rate))
+    percentiles = {}
+    # Оба прохода с одного seed рисуют одни и те же кадры
+    scene = Scene(seed, quality, value)
+    run_frames(scene, warmup, burst_every)
+    timings = {stage: [] for stage in STAGES}
+    counts = run_frames(scene, frames, burst_every, timings)
+    scene.close()
+    for stage in STAGES:
+        values = np.array(timings[stage]) * 1000
+        for p in (50, 90, 99):
+            percentiles[f'{stage}_p{p}_ms'] = round(float(np.percentile(values, p)), 3)
+
+    scene = Scene(seed, quality, value)
+    run_frames(scene, warmup, burst_every)
+    allocated, collections, blocks = measure_allocations(scene, frames, burst_every)
+    scene.close()
+    return {
+        'value': value,
+        'burst_rate': burst_rate,
+        'quality': quality,
+        'frames': frames,
+        'particles_mean': round(float(np.mean(counts)), 1),
+        'particles_max': int(max(counts)),
+        **percentiles,
+        'alloc_kb_per_frame': round(float(np.mean(allocated)) / 1024, 1),
+        'alloc_kb_max': round(max(allocated) / 1024, 1),
+        'gc_collections': collections,
+        'retained_blocks': blocks
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк отрисовки эффектов счетчика')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--warmup', type=int, default=30, help='кадров до замера (спрайты атласа, кэш текста)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--values', type=int, nargs='+', default=VALUES)
+    parser.add_argument('--burst-rates', type=float, nargs='+', default=BURST_RATES)
+    parser.add_argument('--quality', choices=QUALITY_NAMES, default=QUALITY_NAMES[0])
+    parser.add_argument('--json', action='store_true', help='вывести результаты в JSON')
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    results = []
+    # AnimatedLabel.update_color печатает прогресс; в stdout должен идти только отчет
+    with contextlib.redirect_stdout(sys.stderr):
+        for value in args.values:
+            for burst_rate in args.burst_rates:
+                results.append(run_case(value, burst_rate, args.frames, args.warmup, args.seed, args.quality))
+                app.processEvents()
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    header = f'{"value":>6}{"bursts/s":>9}{"particles":>10}{"update p50":>11}{"label p50":>10}' \
+             f'{"overlay p50":>12}{"total p50":>10}{"total p99":>10}{"KB/frame":>9}{"gc":>5}{"kept":>6}'
+    print(header)
+    for r in results:
+        print(f'{r["value"]:>6}{r["burst_rate"]:>9}{r["particles_mean"]:>10}{r["update_p50_ms"]:>11}'
+              f'{r["label_p50_ms"]:>10}{r["overlay_p50_ms"]:>12}{r["total_p50_ms"]:>10}{r["total_p99_ms"]:>10}'
+              f'{r["alloc_kb_per_frame"]:>9}{r["gc_collections"]:>5}{r["retained_blocks"]:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import QApplication, QSplashScreen
 from PySide6.QtGui import QPixmap
 from PySide6.QtCore import Qt, QTimer
@@ -36,4 +37,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Нужно для процесса автокликера в собранном PyInstaller .exe
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,12 +1,15 @@
+import time
 from PySide6.QtWidgets import QLabel
-from PySide6.QtCore import Qt, QPropertyAnimation, QSequentialAnimationGroup, QEasingCurve, QParallelAnimationGroup, Property, QUrl, QRectF, QPointF, QAbstractAnimation
-from PySide6.QtGui import QPainter, QTransform, QFont, QPen, QColor, QPainterPath, QRadialGradient
+from PySide6.QtCore import Qt, QPropertyAnimation, QSequentialAnimationGroup, QEasingCurve, QParallelAnimationGroup, Property, QUrl, QRectF, QPointF
+from PySide6.QtGui import QPainter, QTransform, QFont, QPen, QColor, QPixmap
 from PySide6.QtMultimedia import QSoundEffect
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-import math
 from utils.helpers import resource_path
 
+# Наибольший масштаб текста в animate()
+TEXT_CACHE_SCALE = 1.5
+
 class AnimatedLabel(QLabel):
     def __init__(self, text, parent=None, effects_overlay=None):
         super().__init__(text, parent)
@@ -32,6 +35,63 @@ class AnimatedLabel(QLabel):
         self.work_hours = (self.shift_end - self.shift_start).seconds / 3600 - self.break_duration / 60
         self.tasks_per_hour = self.daily_goal / self.work_hours
         self.current_color = QColor(120, 120, 255)  # Начальный холодный цвет (заметный синий)
+        self.text_font = QFont("SF Pro Display", 25, QFont.Bold)
+        # Текст со свечением, отрисованный в pixmap; ключ - (текст, цвет, свечение, DPR, размер)
+        self._text_cache = None
+        self._text_cache_key = None
+        self.anim_group = self._build_animation()
+
+    def _build_animation(self):
+        """Анимация счетчика создается один раз; animate() только перезапускает ее."""
+        group = QSequentialAnimationGroup(self)
+
+        self.spin_anim = QPropertyAnimation(self, b"rotation")
+        self.spin_anim.setDuration(600)
+        self.spin_anim.setStartValue(0)
+        self.spin_anim.setEndValue(720)
+        self.spin_anim.setEasingCurve(QEasingCurve.OutInQuad)
+        group.addAnimation(self.spin_anim)
+
+        explosion_group = QParallelAnimationGroup(group)
+        self.scale_anim = QPropertyAnimation(self, b"scale")
+        self.scale_anim.setDuration(300)
+        self.scale_anim.setStartValue(1.0)
+        self.scale_anim.setEndValue(1.5)
+        self.scale_anim.setEasingCurve(QEasingCurve.OutQuad)
+        explosion_group.addAnimation(self.scale_anim)
+
+        self.fade_anim = QPropertyAnimation(self, b"windowOpacity")
+        self.fade_anim.setDuration(300)
+        self.fade_anim.setStartValue(1.0)
+        self.fade_anim.setEndValue(0.0)
+        self.fade_anim.setEasingCurve(QEasingCurve.OutQuad)
+        explosion_group.addAnimation(self.fade_anim)
+
+        group.addAnimation(explosion_group)
+
+        reset_group = QParallelAnimationGroup(group)
+        reset_scale = QPropertyAnimation(self, b"scale")
+        reset_scale.setDuration(300)
+        reset_scale.setStartValue(1.5)
+        reset_scale.setEndValue(1.0)
+        reset_scale.setEasingCurve(QEasingCurve.InQuad)
+        reset_group.addAnimation(reset_scale)
+
+        reset_fade = QPropertyAnimation(self, b"windowOpacity")
+        reset_fade.setDuration(300)
+        reset_fade.setStartValue(0.0)
+        reset_fade.setEndValue(1.0)
+        reset_fade.setEasingCurve(QEasingCurve.InQuad)
+        reset_group.addAnimation(reset_fade)
+
+        reset_rotation = QPropertyAnimation(self, b"rotation")
+        reset_rotation.setDuration(0)
+        reset_rotation.setStartValue(0)
+        reset_rotation.setEndValue(0)
+        reset_group.addAnimation(reset_rotation)
+
+        group.addAnimation(reset_group)
+        return group
 
     def set_value(self, value):
         self._value = value
@@ -102,6 +162,36 @@ class AnimatedLabel(QLabel):
         self.current_color = QColor(r, g, b)
         self.current_color.setAlpha(255)  # Гарантируем непрозрачность
 
+    def _text_pixmap(self):
+        """Свечение и текст одним pixmap; перерисовывается, только когда меняется ключ."""
+        dpr = self.devicePixelRatioF()
+        key = (self.text(), self.current_color.rgba(), self._glow, dpr, self.width(), self.height())
+        if key != self._text_cache_key:
+            # Запас по разрешению под увеличение в animate(), чтобы текст не размывался
+            scale = dpr * TEXT_CACHE_SCALE
+            pixmap = QPixmap(round(self.width() * scale), round(self.height() * scale))
+            pixmap.setDevicePixelRatio(scale)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setFont(self.text_font)
+
+            # Свечение
+            glow_color = QColor(self.current_color)
+            glow_color.setAlphaF(self._glow)
+            for radius in range(4, 20, 4):
+                painter.setPen(QPen(glow_color, radius))
+                painter.drawText(self.rect(), Qt.AlignCenter, self.text())
+
+            # Убедимся, что текст непрозрачный
+            text_color = QColor(self.current_color)
+            text_color.setAlpha(255)  # Принудительная непрозрачность
+            painter.setPen(QPen(text_color, 1.5))
+            painter.drawText(self.rect(), Qt.AlignCenter, self.text())
+            painter.end()
+            self._text_cache, self._text_cache_key = pixmap, key
+        return self._text_cache
+
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -116,58 +206,27 @@ class AnimatedLabel(QLabel):
         transform.translate(-center.x(), -center.y())
         painter.setTransform(transform)
 
-        # Цвет текста
-        painter.setFont(QFont("SF Pro Display", 25, QFont.Bold))
-
-        # Свечение
-        glow_color = QColor(self.current_color)
-        glow_color.setAlphaF(self._glow)
-        for radius in range(4, 20, 4):
-            painter.setPen(QPen(glow_color, radius))
-            painter.drawText(self.rect(), Qt.AlignCenter, self.text())
-
-        # Убедимся, что текст непрозрачный
-        text_color = QColor(self.current_color)
-        text_color.setAlpha(255)  # Принудительная непрозрачность
-        painter.setPen(QPen(text_color, 1.5))
-        painter.drawText(self.rect(), Qt.AlignCenter, self.text())
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(0, 0, self._text_pixmap())
 
         # Сбрасываем трансформацию для искр
         painter.resetTransform()
 
         # Рисуем искры внутри области счетчика
         if self.effects_overlay:
+            started = time.perf_counter()
             global_rect = self.mapTo(self.window().centralWidget(), self.rect().topLeft())
             counter_rect = QRectF(global_rect.x(), global_rect.y(), self.rect().width(), self.rect().height())
+            # Не вызывает update(): иначе каждая отрисовка заказывала бы следующую
             self.effects_overlay.set_counter_rect(counter_rect)
 
-            for spark in self.effects_overlay.sparks:
-                if counter_rect.contains(QPointF(spark.x, spark.y)):
-                    local_x = spark.x - global_rect.x()
-                    local_y = spark.y - global_rect.y()
-                    c = QColor(self.current_color)
-                    alpha = (spark.life / spark.max_life) * (0.8 + 0.2 * math.sin(spark.phase))
-                    c.setAlphaF(alpha)
-
-                    if spark.smoke and self._value >= 50:
-                        smoke_color = QColor(80, 80, 80, int(spark.smoke_alpha * spark.life * 255))
-                        gradient = QRadialGradient(local_x, local_y, spark.size * 3)
-                        gradient.setColorAt(0, smoke_color)
-                        gradient.setColorAt(1, QColor(0, 0, 0, 0))
-                        painter.setPen(Qt.NoPen)
-                        painter.setBrush(gradient)
-                        painter.drawEllipse(QPointF(local_x, local_y), spark.size * 3, spark.size * 3)
-
-                    painter.setPen(QPen(c, spark.size / 2))
-                    path = QPainterPath()
-                    rays = 6 if spark.value >= 50 else 4
-                    for i in range(rays):
-                        angle = i * (360 / rays)
-                        length = spark.size * (1.5 if i % 2 == 0 else 0.8)
-                        path.moveTo(local_x, local_y)
-                        path.lineTo(local_x + length * math.cos(math.radians(angle)),
-                                    local_y + length * math.sin(math.radians(angle)))
-                    painter.drawPath(path)
+            # В режиме 'thread' искры внутри счетчика рисует поток эффектов
+            overlay = self.effects_overlay
+            if overlay.renderer is None:
+                inside, _ = overlay.spark_partition()
+                overlay.atlas.draw_sparks(painter, overlay.sparks.draw_list(inside, overlay.quality.smoke_every),
+                                          -global_rect.x(), -global_rect.y(), self.current_color.rgba())
+                overlay.quality.add((time.perf_counter() - started) * 1000)
 
     def animate(self):
         if self.effects_overlay:
@@ -179,55 +238,18 @@ class AnimatedLabel(QLabel):
         if self.sound.isLoaded():
             self.sound.play()
 
-        anim_group = QSequentialAnimationGroup(self)
-
-        spin_anim = QPropertyAnimation(self, b"rotation")
-        spin_anim.setDuration(600)
-        spin_anim.setStartValue(0)
-        spin_anim.setEndValue(720)
-        spin_anim.setEasingCurve(QEasingCurve.OutInQuad)
-        anim_group.addAnimation(spin_anim)
-
-        explosion_group = QParallelAnimationGroup()
-        scale_anim = QPropertyAnimation(self, b"scale")
-        scale_anim.setDuration(300)
-        scale_anim.setStartValue(1.0)
-        scale_anim.setEndValue(1.5)
-        scale_anim.setEasingCurve(QEasingCurve.OutQuad)
-        explosion_group.addAnimation(scale_anim)
-
-        fade_anim = QPropertyAnimation(self, b"windowOpacity")
-        fade_anim.setDuration(300)
-        fade_anim.setStartValue(1.0)
-        fade_anim.setEndValue(0.0)
-        fade_anim.setEasingCurve(QEasingCurve.OutQuad)
-        explosion_group.addAnimation(fade_anim)
-
-        anim_group.addAnimation(explosion_group)
-
-        reset_group = QParallelAnimationGroup()
-        reset_scale = QPropertyAnimation(self, b"scale")
-        reset_scale.setDuration(300)
-        reset_scale.setStartValue(1.5)
-        reset_scale.setEndValue(1.0)
-        reset_scale.setEasingCurve(QEasingCurve.InQuad)
-        reset_group.addAnimation(reset_scale)
-
-        reset_fade = QPropertyAnimation(self, b"windowOpacity")
-        reset_fade.setDuration(300)
-        reset_fade.setStartValue(0.0)
-        reset_fade.setEndValue(1.0)
-        reset_fade.setEasingCurve(QEasingCurve.InQuad)
-        reset_group.addAnimation(reset_fade)
-
-        reset_rotation = QPropertyAnimation(self, b"rotation")
-        reset_rotation.setDuration(0)
-        reset_rotation.setStartValue(0)
-        reset_rotation.setEndValue(0)
-        reset_group.addAnimation(reset_rotation)
-
-        anim_group.addAnimation(reset_group)
-        anim_group.start(QAbstractAnimation.DeleteWhenStopped)
+        # Залп посреди анимации перезапускает ее, а не запускает вторую поверх:
+        # вращение, масштаб и прозрачность пишет только одна анимация.
+        # Если вращение уже прошло, счетчик мог погаснуть - возвращаем его к
+        # исходному виду, иначе частые залпы гасили бы его совсем
+        self.anim_group.stop()
+        self.set_scale(1.0)
+        self.setWindowOpacity(1.0)
+        # Вращение продолжается с текущего угла и заканчивается на кратном 360,
+        # поэтому сброс угла в 0 в конце анимации не дает рывка
+        self.spin_anim.setStartValue(self._rotation % 360)
+        self.spin_anim.setEndValue(720)
+        self.anim_group.start()
 
     def get_rotation(self): return self._rotation
     def set_rotation(self, value): self._rotation = value; self.update()
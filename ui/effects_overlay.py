@@ -1,142 +1,206 @@
+import time
 from PySide6.QtWidgets import QWidget
-from PySide6.QtCore import Qt, QTimer, QPointF, QRectF
-from PySide6.QtGui import QPainter, QPen, QPainterPath, QRadialGradient, QColor
-import random
-import math
-
-class Spark:
-    def __init__(self, center, value, label_color):
-        self.x = center.x()
-        self.y = center.y()
-        self.value = value
-        angle = random.uniform(0, 360)
-        speed = self.get_speed()
-        self.vx = speed * math.cos(math.radians(angle))
-        self.vy = speed * math.sin(math.radians(angle))
-        self.life = random.uniform(0.5, 1.0)
-        self.max_life = self.life
-        self.size = self.get_size()
-        self.color = label_color  # Используем цвет из AnimatedLabel
-        self.spin = random.uniform(-0.6, 0.6)
-        self.smoke = value >= 50
-        self.smoke_alpha = random.uniform(0.15, 0.3)
-        self.phase = random.uniform(0, 2 * math.pi)
-
-    def get_speed(self):
-        t = min(self.value / 1000, 1.0)
-        return random.uniform(2, 6 + 10 * t)
-
-    def get_size(self):
-        t = min(self.value / 1000, 1.0)
-        return random.uniform(0.5, 2 + 8 * t)
-
-    def update(self):
-        self.vy += 0.15
-        self.vx += self.spin
-        self.x += self.vx
-        self.y += self.vy
-        self.vx *= 0.93
-        self.vy *= 0.93
-        self.life -= 0.025
-        self.phase += 0.2
-        return self.life > 0
-
-class Flame:
-    def __init__(self, center):
-        self.x = center.x() + random.uniform(-30, 30)
-        self.y = center.y() + random.uniform(-30, 30)
-        self.size = random.uniform(8, 14)
-        self.life = 1.0
-        self.phase = random.uniform(0, 2 * math.pi)
-
-    def update(self):
-        self.life -= 0.015
-        self.size += 0.4 * math.sin(self.phase)
-        self.phase += 0.2
-        return self.life > 0
+from PySide6.QtCore import Qt, QTimer, QPointF, QRectF, QElapsedTimer, Slot, QRect, QEvent
+from PySide6.QtGui import QPainter, QColor
+from ui.particle_system import (SparkArrays, FlameArrays, EffectsQuality, FRAME_MS, MAX_CATCHUP_FRAMES,
+                                 has_particles, particles_room, particles_bounds)
+from ui.sprite_atlas import SpriteAtlas, FLAME_GREENS
+from ui.effects_renderer import EffectsRenderThread
 
 class EffectsOverlay(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, render_mode='gui'):
         super().__init__(parent)
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.sparks = []
-        self.flames = []
+        # Частицы хранятся массивами NumPy, обновляются одним шагом на кадр
+        self.sparks = SparkArrays()
+        self.flames = FlameArrays()
+        # Спрайты частиц; общий с AnimatedLabel, который рисует искры внутри счетчика
+        self.atlas = SpriteAtlas()
+        # Бюджет частиц и уровень качества по времени шага и отрисовки
+        self.quality = EffectsQuality(target_ms=FRAME_MS)
         self._value = 0
         self.center = QPointF(0, 0)
         self.counter_rect = QRectF(0, 0, 0, 0)
+        # Таймер работает, только пока есть живые частицы и окно видно
         self.spark_timer = QTimer(self)
+        self.spark_timer.setInterval(FRAME_MS)
         self.spark_timer.timeout.connect(self.update_sparks)
-        self.spark_timer.start(16)
+        self.frame_clock = QElapsedTimer()
+        self._frame_backlog = 0.0
+        # isVisible() у свернутого окна остается True, поэтому показ отслеживаем сами
+        self._shown = False
+        # Индексы искр внутри и снаружи counter_rect; пересчитываются после шага или выброса
+        self._partition = None
+        # Область частиц на прошлом кадре: перерисовывается вместе с текущей, чтобы стереть след
+        self._particles_rect = QRectF()
         self.label = None  # Ссылка на AnimatedLabel
+        # 'gui' - частицы считаются и рисуются здесь, 'thread' - в EffectsRenderThread,
+        # а paintEvent только выводит готовый кадр
+        self.renderer = None
+        self._counter_state = None
+        if render_mode == 'thread':
+            self.renderer = EffectsRenderThread()
+            self.renderer.frame_ready.connect(self._on_frame_ready)
+            self.renderer.start()
 
     def set_label(self, label):
         self.label = label
 
+    # Значение, центр и область счетчика только влияют на следующие кадры частиц,
+    # сами по себе перерисовки не требуют. set_counter_rect вызывается из
+    # AnimatedLabel.paintEvent, и update() здесь зациклил бы отрисовку.
     def set_value(self, value):
         self._value = value
-        self.update()
 
     def set_center(self, center):
         self.center = center
-        self.update()
 
     def set_counter_rect(self, rect):
+        if rect != self.counter_rect:
+            self._partition = None
         self.counter_rect = rect
-        self.update()
+        if self.renderer is not None:
+            rgba = self.label.current_color.rgba() if self.label else None
+            state = ((rect.left(), rect.top(), rect.right(), rect.bottom()), rgba)
+            if state != self._counter_state:
+                self._counter_state = state
+                self.renderer.set_counter(*state)
+
+    @Slot(QRect)
+    def _on_frame_ready(self, rect):
+        self.update(rect)
+
+    def shutdown(self):
+        """Останавливает поток отрисовки, если он есть."""
+        if self.renderer is not None:
+            self.renderer.stop()
+            self.renderer.wait()
+            self.renderer = None
+
+    def spark_partition(self):
+        """(искры внутри счетчика - их рисует AnimatedLabel, искры снаружи - для overlay)."""
+        if self._partition is None:
+            r = self.counter_rect
+            self._partition = self.sparks.partition(r.left(), r.top(), r.right(), r.bottom())
+        return self._partition
+
+    def particles_rect(self):
+        """Общая рамка живых искр и пламени."""
+        bounds = particles_bounds(self.sparks, self.flames)
+        if bounds is None:
+            return QRectF()
+        return QRectF(QPointF(bounds[0], bounds[1]), QPointF(bounds[2], bounds[3]))
+
+    def has_particles(self):
+        return has_particles(self.sparks, self.flames)
+
+    def is_displayed(self):
+        """Overlay показан и его окно не свернуто."""
+        return self._shown and not self.window().isMinimized()
+
+    def _update_displayed(self):
+        displayed = self.is_displayed()
+        if self.renderer is not None:
+            self.renderer.set_visible(displayed)
+        if displayed:
+            self._start_frames()
+        else:
+            self.spark_timer.stop()
+
+    def _start_frames(self):
+        if not self.spark_timer.isActive() and self.is_displayed() and self.has_particles():
+            self.frame_clock.start()
+            self._frame_backlog = 0.0
+            self.quality.drop_frame()
+            self.spark_timer.start()
 
     def update_sparks(self):
-        self.sparks = [s for s in self.sparks if s.update()]
-        self.flames = [f for f in self.flames if f.update()]
-        self.update()
+        # Отрисовка прошлого кадра уже прошла - кадр можно закрыть
+        self.quality.end_frame()
+        started = time.perf_counter()
+        # Шагов симуляции столько, сколько кадров по FRAME_MS реально прошло,
+        # поэтому скорость анимации не зависит от дрожания таймера
+        self._frame_backlog += self.frame_clock.restart() / FRAME_MS
+        steps = int(self._frame_backlog)
+        self._frame_backlog -= steps
+        for _ in range(min(steps, MAX_CATCHUP_FRAMES)):
+            self.sparks.step()
+            self.flames.step()
+        if steps:
+            self._partition = None
+        if not self.quality.flames:
+            self.flames.clear()
+        # Перерисовываем только то, где частицы были и где они теперь
+        rect = self.particles_rect()
+        dirty = rect.united(self._particles_rect)
+        self._particles_rect = rect
+        self.quality.add((time.perf_counter() - started) * 1000)
+        if not self.has_particles():
+            self.spark_timer.stop()
+        if not dirty.isEmpty():
+            self.update(dirty.toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._shown = True
+        # Сворачивание окна приходит только ему самому, как WindowStateChange
+        self.window().installEventFilter(self)
+        self._update_displayed()
+
+    def hideEvent(self, event):
+        # Свернутое или скрытое окно не анимируем; частицы доиграют после показа
+        super().hideEvent(event)
+        self._shown = False
+        self._update_displayed()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.WindowStateChange and obj is self.window():
+            self._update_displayed()
+        return super().eventFilter(obj, event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.renderer is not None:
+            self.renderer.set_geometry(self.width(), self.height(), self.devicePixelRatioF())
 
     def emit_sparks(self):
-        count = 20 + int(self._value / 10) * 3
+        if self.renderer is not None:
+            label_color = self.label.current_color if self.label else QColor(255, 255, 255)
+            self.renderer.emit_sparks(20 + int(self._value / 10) * 3, self.center.x(), self.center.y(),
+                                      self._value, label_color.rgba())
+            return
+        # Частые нажатия складывают залпы: сверх бюджета новые искры не выпускаются
+        count = min(20 + int(self._value / 10) * 3, particles_room(self.quality, self.sparks, self.flames))
+        if count <= 0:
+            return
         label_color = self.label.current_color if self.label else QColor(255, 255, 255)
-        for _ in range(count):
-            self.sparks.append(Spark(self.center, self._value, label_color))
+        self.sparks.emit(count, self.center.x(), self.center.y(), self._value, label_color.rgba())
+        self._partition = None
+        self._start_frames()
 
     def emit_flames(self):
-        if self._value >= 50:
-            count = 4 + int(self._value / 100)
-            for _ in range(count):
-                self.flames.append(Flame(self.center))
+        if self.renderer is not None:
+            if self._value >= 50:
+                self.renderer.emit_flames(4 + int(self._value / 100), self.center.x(), self.center.y())
+            return
+        if self._value >= 50 and self.quality.flames:
+            count = min(4 + int(self._value / 100), particles_room(self.quality, self.sparks, self.flames))
+            self.flames.emit(count, self.center.x(), self.center.y())
+            self._start_frames()
 
     def paintEvent(self, event):
+        if self.renderer is not None:
+            painter = QPainter(self)
+            self.renderer.draw(painter, event.rect())
+            painter.end()
+            return
+        started = time.perf_counter()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
 
-        for spark in self.sparks:
-            if not self.counter_rect.contains(QPointF(spark.x, spark.y)):
-                c = QColor(spark.color)
-                alpha = (spark.life / spark.max_life) * (0.8 + 0.2 * math.sin(spark.phase))
-                c.setAlphaF(alpha)
-
-                if spark.smoke and self._value >= 50:
-                    smoke_color = QColor(80, 80, 80, int(spark.smoke_alpha * spark.life * 255))
-                    gradient = QRadialGradient(spark.x, spark.y, spark.size * 3)
-                    gradient.setColorAt(0, smoke_color)
-                    gradient.setColorAt(1, QColor(0, 0, 0, 0))
-                    painter.setPen(Qt.NoPen)
-                    painter.setBrush(gradient)
-                    painter.drawEllipse(QPointF(spark.x, spark.y), spark.size * 3, spark.size * 3)
-
-                painter.setPen(QPen(c, spark.size / 2))
-                path = QPainterPath()
-                rays = 6 if spark.value >= 50 else 4
-                for i in range(rays):
-                    angle = i * (360 / rays)
-                    length = spark.size * (1.5 if i % 2 == 0 else 0.8)
-                    path.moveTo(spark.x, spark.y)
-                    path.lineTo(spark.x + length * math.cos(math.radians(angle)),
-                                spark.y + length * math.sin(math.radians(angle)))
-                painter.drawPath(path)
-
-        for flame in self.flames:
-            c = QColor(255, random.randint(120, 220), 20)
-            c.setAlphaF(flame.life * 0.9)
-            gradient = QRadialGradient(flame.x, flame.y, flame.size)
-            gradient.setColorAt(0, c)
-            gradient.setColorAt(1, QColor(255, 50, 0, 0))
-            painter.setBrush(gradient)
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(QPointF(flame.x, flame.y), flame.size, flame.size)
\ No newline at end of file
+        self.atlas.set_device_pixel_ratio(self.devicePixelRatioF())
+        _, outside = self.spark_partition()
+        self.atlas.draw_sparks(painter, self.sparks.draw_list(outside, self.quality.smoke_every))
+        self.atlas.draw_flames(painter, self.flames.draw_list(self.flames.indices(), len(FLAME_GREENS)))
+        painter.end()
+        self.quality.add((time.perf_counter() - started) * 1000)
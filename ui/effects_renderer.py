@@ -0,0 +1,172 @@
+import time
+import threading
+from PySide6.QtCore import Qt, QThread, Signal, QRect, QRectF, QPointF
+from PySide6.QtGui import QPainter, QImage
+from ui.particle_system import (SparkArrays, FlameArrays, EffectsQuality, FRAME_MS, MAX_CATCHUP_FRAMES,
+                                 has_particles, particles_room, particles_bounds)
+from ui.sprite_atlas import SpriteAtlas, FLAME_GREENS
+
+
+class EffectsRenderThread(QThread):
+    """Симуляция и отрисовка частиц вне GUI-потока.
+
+    Поток шагает частицы и рисует их в задний QImage, потом меняет буферы
+    местами и сообщает frame_ready с областью, которую нужно перерисовать.
+    GUI-поток в EffectsOverlay.paintEvent только выводит передний буфер через
+    draw(), так что его работа на кадр не зависит от числа частиц.
+
+    Команды из GUI (выбросы, размер окна, область счетчика) копятся в
+    очереди под блокировкой и применяются в начале кадра: частицы, атлас и
+    уровень качества принадлежат только этому потоку. Пока живых частиц
+    нет или overlay скрыт, поток спит до следующей команды.
+    """
+    frame_ready = Signal(QRect)
+
+    def __init__(self):
+        super().__init__()
+        self.sparks = SparkArrays()
+        self.flames = FlameArrays()
+        # QPixmap вне GUI-потока нельзя, поэтому спрайты в QImage
+        self.atlas = SpriteAtlas(images=True)
+        self.quality = EffectsQuality(target_ms=FRAME_MS)
+        self.stop_event = threading.Event()
+        self._wake = threading.Event()
+        # Защищает очередь команд и передний буфер: GUI держит ее, пока рисует буфер,
+        # поэтому поток не начнет писать в него до конца drawImage
+        self._lock = threading.Lock()
+        self._commands = []
+        self._visible = False
+        self._size = (0, 0)
+        self._dpr = 1.0
+        self._counter_rect = (0.0, 0.0, 0.0, 0.0)
+        self._label_rgba = None
+        self._front = None
+        self._back = None
+        self._particles_rect = QRectF()
+
+    # Вызываются из GUI-потока
+
+    def emit_sparks(self, count, cx, cy, value, rgba):
+        self._post('sparks', (count, cx, cy, value, rgba))
+
+    def emit_flames(self, count, cx, cy):
+        self._post('flames', (count, cx, cy))
+
+    def set_geometry(self, width, height, dpr):
+        self._post('geometry', (width, height, dpr))
+
+    def set_counter(self, rect, rgba):
+        """Искры внутри rect (left, top, right, bottom) рисуются цветом счетчика rgba."""
+        self._post('counter', (rect, rgba))
+
+    def set_visible(self, visible):
+        self._post('visible', visible)
+
+    def draw(self, painter, rect):
+        """Выводит часть rect последнего готового кадра."""
+        with self._lock:
+            image = self._front
+            if image is None:
+                return
+            dpr = image.devicePixelRatio()
+            source = QRectF(rect.x() * dpr, rect.y() * dpr, rect.width() * dpr, rect.height() * dpr)
+            painter.drawImage(QRectF(rect), image, source)
+
+    def stop(self):
+        self.stop_event.set()
+        self._wake.set()
+
+    def _post(self, name, args):
+        with self._lock:
+            self._commands.append((name, args))
+        self._wake.set()
+
+    # Поток отрисовки
+
+    def _apply_commands(self):
+        with self._lock:
+            commands, self._commands = self._commands, []
+        for name, args in commands:
+            if name == 'sparks':
+                count, cx, cy, value, rgba = args
+                self.sparks.emit(min(count, particles_room(self.quality, self.sparks, self.flames)), cx, cy, value, rgba)
+            elif name == 'flames':
+                count, cx, cy = args
+                if self.quality.flames:
+                    self.flames.emit(min(count, particles_room(self.quality, self.sparks, self.flames)), cx, cy)
+            elif name == 'geometry':
+                width, height, self._dpr = args
+                self._size = (width, height)
+                self.atlas.set_device_pixel_ratio(self._dpr)
+                with self._lock:
+                    self._front = self._back = None
+            elif name == 'counter':
+                self._counter_rect, self._label_rgba = args
+            elif name == 'visible':
+                self._visible = args
+        return bool(commands)
+
+    def _buffer(self):
+        width, height = self._size
+        image = QImage(max(1, round(width * self._dpr)), max(1, round(height * self._dpr)),
+                       QImage.Format_ARGB32_Premultiplied)
+        image.setDevicePixelRatio(self._dpr)
+        return image
+
+    def _render(self):
+        if self._back is None:
+            self._back = self._buffer()
+        image = self._back
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        inside, outside = self.sparks.partition(*self._counter_rect)
+        smoke_every = self.quality.smoke_every
+        self.atlas.draw_sparks(painter, self.sparks.draw_list(outside, smoke_every))
+        self.atlas.draw_sparks(painter, self.sparks.draw_list(inside, smoke_every), rgba=self._label_rgba)
+        self.atlas.draw_flames(painter, self.flames.draw_list(self.flames.indices(), len(FLAME_GREENS)))
+        painter.end()
+        with self._lock:
+            self._back, self._front = self._front, image
+
+    def run(self):
+        backlog = 0.0
+        last = None
+        while not self.stop_event.is_set():
+            running = self._visible and has_particles(self.sparks, self.flames)
+            if running:
+                timeout = max(0.0, last + FRAME_MS / 1000 - time.perf_counter())
+            else:
+                # Простой: часы кадров запустятся заново с первой команды
+                timeout = None
+                last = None
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self.stop_event.is_set():
+                break
+            changed = self._apply_commands()
+            if not self._visible or not self._size[0]:
+                continue
+            started = time.perf_counter()
+            if last is None:
+                last = started
+            backlog += (started - last) * 1000 / FRAME_MS
+            last = started
+            steps = int(backlog)
+            backlog -= steps
+            for _ in range(min(steps, MAX_CATCHUP_FRAMES)):
+                self.sparks.step()
+                self.flames.step()
+            if not self.quality.flames:
+                self.flames.clear()
+            if not steps and not changed:
+                continue
+            self._render()
+            bounds = particles_bounds(self.sparks, self.flames)
+            rect = QRectF() if bounds is None else QRectF(QPointF(bounds[0], bounds[1]), QPointF(bounds[2], bounds[3]))
+            dirty = rect.united(self._particles_rect)
+            self._particles_rect = rect
+            self.quality.add((time.perf_counter() - started) * 1000)
+            self.quality.end_frame()
+            if not dirty.isEmpty():
+                self.frame_ready.emit(dirty.toAlignedRect().adjusted(-1, -1, 1, 1))
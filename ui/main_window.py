@@ -19,9 +19,12 @@ from ui.effects_overlay import EffectsOverlay
 from ui.draggable_label import DraggableLabel
 from ui.draggable_button_label import DraggableButtonLabel
 from ui.switch import QSwitch
+from ui.region_selector import RegionSelector
 from utils.autoclicker import AutoClicker
+from utils.click_telemetry import STAGES
+from utils.helpers import data_path
 from utils.key_press_thread import KeyPressThread
-from utils.styles import MAIN_STYLE, BUTTON_STYLE, COUNTER_LABEL_STYLE, DATE_LABEL_STYLE, NOTE_PANEL_STYLE, CLOSE_BUTTON_STYLE
+from utils.styles import MAIN_STYLE, BUTTON_STYLE, COUNTER_LABEL_STYLE, DATE_LABEL_STYLE, NOTE_PANEL_STYLE, CLOSE_BUTTON_STYLE, TELEMETRY_LABEL_STYLE
 
 def resource_path(relative_path):
     """Возвращает путь к ресурсам для PyCharm и скомпилированного приложения."""
@@ -31,18 +34,6 @@ def resource_path(relative_path):
         base_path = os.path.abspath('.')
     return os.path.join(base_path, relative_path)
 
-def data_path(filename):
-    """Возвращает путь для данных в папке data."""
-    if hasattr(sys, '_MEIPASS'):
-        # В скомпилированном виде сохраняем в папку с .exe
-        base_path = os.path.dirname(sys.executable)
-    else:
-        # В PyCharm сохраняем в корне проекта
-        base_path = os.path.abspath('.')
-    data_dir = os.path.join(base_path, 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, filename)
-
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -57,6 +48,7 @@ class MainWindow(QMainWindow):
         self.notes_file = data_path('notes.json')
         self.notes_positions_file = data_path('notes_positions.json')
         self.task_history_file = data_path('task_history.json')
+        self.effects_file = data_path('effects.json')
         self.counter = self._load_counter()
         self.daily_goal = 250
         self.notes = self._load_notes()
@@ -66,7 +58,8 @@ class MainWindow(QMainWindow):
             'show_notes_2': 'space+2',
             'increment_counter': 'tab',
             'toggle_autoclicker': 'f10',
-            'load_template': 'f9'
+            'load_template': 'f9',
+            'select_region': 'f8'
         }
         self.is_snipping = False
         self.notes_panel = None
@@ -75,6 +68,7 @@ class MainWindow(QMainWindow):
         self.time_tracker_window = None
         self.patent_calculator_window = None
         self.task_planner_window = None
+        self.region_selector = None
         self.autoclicker = AutoClicker()
         self._init_ui()
         self._init_key_thread()
@@ -103,6 +97,14 @@ class MainWindow(QMainWindow):
             print(f'Ошибка загрузки notes.json: {e}')
             return {}
 
+    def _load_effects_settings(self):
+        """Настройки эффектов; render_mode 'thread' переносит частицы в отдельный поток."""
+        try:
+            return json.load(open(self.effects_file, 'r', encoding='utf-8')) if os.path.exists(self.effects_file) else {}
+        except Exception as e:
+            print(f'Ошибка загрузки effects.json: {e}')
+            return {}
+
     def _load_positions(self):
         try:
             if os.path.exists(self.notes_positions_file):
@@ -163,7 +165,7 @@ class MainWindow(QMainWindow):
         widget.setLayout(self.main_layout)
         self.setCentralWidget(widget)
 
-        self.effects_overlay = EffectsOverlay(widget)
+        self.effects_overlay = EffectsOverlay(widget, self._load_effects_settings().get('render_mode', 'gui'))
         self.effects_overlay.setGeometry(widget.rect())
 
         counter_container = QVBoxLayout()
@@ -251,13 +253,32 @@ class MainWindow(QMainWindow):
             bottom_row.addWidget(btn)
 
         self.switch = QSwitch(self, self.autoclicker.toggle, self._update_switch_style)
-        bottom_row.addWidget(self.switch)
+        self.telemetry_label = None
+        if self.autoclicker.show_telemetry:
+            switch_container = QVBoxLayout()
+            switch_container.setSpacing(0)
+            switch_container.addWidget(self.switch)
+            self.telemetry_label = QLabel('')
+            self.telemetry_label.setAlignment(Qt.AlignCenter)
+            self.telemetry_label.setStyleSheet(TELEMETRY_LABEL_STYLE)
+            self.telemetry_label.setFixedWidth(self.button_size + 2)
+            switch_container.addWidget(self.telemetry_label)
+            bottom_row.addLayout(switch_container)
+            self.telemetry_timer = QTimer(self)
+            self.telemetry_timer.timeout.connect(self._update_telemetry_label)
+            self.telemetry_timer.start(1000)
+        else:
+            bottom_row.addWidget(self.switch)
 
         buttons_container.addLayout(bottom_row)
 
         self.main_layout.addLayout(buttons_container)
 
-        self.autoclicker.set_switch(self.switch)
+        # Шаблоны уже загружены из библиотеки - сразу показываем готовность
+        self._update_switch_style()
+        self.autoclicker.running_changed.connect(self._on_autoclicker_running_changed)
+        self.autoclicker.templates_changed.connect(self.switch.update_style)
+        self.autoclicker.increment_counter.connect(self._increment_counter)
 
         self.current_date_label = QLabel(self._get_current_date())
         self.current_date_label.setAlignment(Qt.AlignCenter)
@@ -289,6 +310,9 @@ class MainWindow(QMainWindow):
             )
             if reply == QMessageBox.Yes:
                 self._save_task_history()
+        self.autoclicker.toggle(False)
+        self.autoclicker.capture_service.close()
+        self.effects_overlay.shutdown()
         super().closeEvent(event)
 
     def _get_current_date(self):
@@ -318,7 +342,17 @@ class MainWindow(QMainWindow):
         self.counter_label.setGraphicsEffect(glow)
 
     def _update_switch_style(self):
-        self.switch.update_style(self.autoclicker.button_template is not None)
+        self.switch.update_style(self.autoclicker.has_templates())
+
+    def _update_telemetry_label(self):
+        self.telemetry_label.setText(self.autoclicker.telemetry_text())
+        stats = self.autoclicker.stats()
+        self.telemetry_label.setToolTip(
+            '\n'.join([f'{stage}: p50 {stats[stage]["p50"]} / p90 {stats[stage]["p90"]} мс'
+                       for stage in STAGES
+                       if stats[stage]['count']] +
+                      ['кадры: без изменений {skipped}, частично {partial}, целиком {full}'.format(**stats['frames'])])
+        )
 
     def _init_notes_panel(self):
         if self.notes_panel and self.notes_panel.isVisible():
@@ -376,11 +410,28 @@ class MainWindow(QMainWindow):
         self.key_thread.increment_counter.connect(self._increment_counter)
         self.key_thread.toggle_autoclicker.connect(self._toggle_autoclicker)
         self.key_thread.load_template.connect(self.autoclicker.load_template)
+        self.key_thread.select_region.connect(self._select_autoclicker_region)
         self.key_thread.start()
 
     def _toggle_autoclicker(self):
-        self.switch.setChecked(not self.switch.isChecked())
-        self.autoclicker.toggle(self.switch.isChecked())
+        self.autoclicker.toggle(not self.autoclicker.running)
+
+    def _on_autoclicker_running_changed(self, running):
+        self.switch.setChecked(running)
+
+    def _select_autoclicker_region(self):
+        """Открывает оверлей для выделения области поиска автокликера."""
+        if self.region_selector and self.region_selector.isVisible():
+            return
+        self.region_selector = RegionSelector()
+        self.region_selector.regionSelected.connect(self.autoclicker.set_roi)
+        # Оверлей удаляется при закрытии (WA_DeleteOnClose), ссылку на него нужно сбросить
+        self.region_selector.destroyed.connect(self._on_region_selector_destroyed)
+        self.region_selector.show()
+        self.region_selector.activateWindow()
+
+    def _on_region_selector_destroyed(self):
+        self.region_selector = None
 
     def _update_window_size(self):
         buttons_width = (self.button_size + 2) * 3 + 20
@@ -0,0 +1,278 @@
+import math
+import numpy as np
+
+# Длительность кадра симуляции, мс: физика частиц ниже задана на кадр
+FRAME_MS = 16
+# Сколько пропущенных кадров догонять за один тик после подвисания
+MAX_CATCHUP_FRAMES = 4
+
+# Физика искр и пламени за один кадр
+GRAVITY = 0.15
+DAMPING = 0.93
+SPARK_DECAY = 0.025
+FLAME_DECAY = 0.015
+PHASE_STEP = 0.2
+
+# Общий потолок живых частиц (искры + пламя) при полном качестве
+MAX_PARTICLES = 1200
+# Уровни качества эффектов, от полного до одних искр
+QUALITY_FULL = 0
+QUALITY_REDUCED_SMOKE = 1
+QUALITY_NO_SMOKE = 2
+QUALITY_SPARKS_ONLY = 3
+QUALITY_NAMES = ('full', 'reduced_smoke', 'no_smoke', 'sparks_only')
+# Дым у каждой n-й искры (0 - без дыма) и доля бюджета частиц на каждом уровне
+QUALITY_SMOKE_EVERY = (1, 2, 0, 0)
+QUALITY_BUDGET = (1.0, 0.75, 0.5, 0.25)
+
+
+class ParticleArrays:
+    """Пул частиц в виде структуры массивов.
+
+    Каждое поле - отдельный массив NumPy длиной capacity, живые частицы
+    отмечены в alive. Новые частицы занимают свободные слоты умерших,
+    массивы растут только когда свободных не хватает.
+    """
+    FIELDS = ()
+
+    def __init__(self, capacity=256, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.capacity = 0
+        self.alive = np.zeros(0, dtype=bool)
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        old = self.capacity
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - old, dtype=bool)])
+        for name, dtype in self.FIELDS:
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(capacity - old, dtype=dtype)]))
+        self.capacity = capacity
+
+    def _allocate(self, count):
+        free = np.flatnonzero(~self.alive)
+        if len(free) < count:
+            self._grow(max(self.capacity * 2, self.capacity + count - len(free)))
+            free = np.flatnonzero(~self.alive)
+        slots = free[:count]
+        self.alive[slots] = True
+        return slots
+
+    def indices(self):
+        return np.flatnonzero(self.alive)
+
+    def extent(self, slots):
+        """Половина стороны спрайта частиц slots."""
+        raise NotImplementedError
+
+    def bounds(self):
+        """(left, top, right, bottom) живых частиц вместе со спрайтами; None, если живых нет."""
+        slots = self.indices()
+        if not len(slots):
+            return None
+        x, y, half = self.x[slots], self.y[slots], self.extent(slots)
+        return float((x - half).min()), float((y - half).min()), float((x + half).max()), float((y + half).max())
+
+    def clear(self):
+        self.alive[:] = False
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+
+class SparkArrays(ParticleArrays):
+    FIELDS = (
+        ('x', np.float32), ('y', np.float32), ('vx', np.float32), ('vy', np.float32),
+        ('life', np.float32), ('max_life', np.float32), ('size', np.float32), ('spin', np.float32),
+        ('smoke', bool), ('smoke_alpha', np.float32), ('phase', np.float32), ('rays', np.int8),
+        ('color', np.uint32),
+    )
+
+    def emit(self, count, cx, cy, value, rgba):
+        """count искр из точки (cx, cy); rgba - цвет счетчика (QColor.rgba())."""
+        if count <= 0:
+            return
+        rng = self.rng
+        slots = self._allocate(count)
+        t = min(value / 1000, 1.0)
+        angle = np.radians(rng.uniform(0, 360, count))
+        speed = rng.uniform(2, 6 + 10 * t, count)
+        self.x[slots] = cx
+        self.y[slots] = cy
+        self.vx[slots] = speed * np.cos(angle)
+        self.vy[slots] = speed * np.sin(angle)
+        self.life[slots] = self.max_life[slots] = rng.uniform(0.5, 1.0, count)
+        self.size[slots] = rng.uniform(0.5, 2 + 8 * t, count)
+        self.spin[slots] = rng.uniform(-0.6, 0.6, count)
+        self.smoke[slots] = value >= 50
+        self.smoke_alpha[slots] = rng.uniform(0.15, 0.3, count)
+        self.phase[slots] = rng.uniform(0, 2 * math.pi, count)
+        self.rays[slots] = 6 if value >= 50 else 4
+        self.color[slots] = rgba
+
+    def step(self):
+        """Один кадр для всех искр сразу; мертвые слоты освобождаются.
+
+        Считаются все слоты пула, без маски: значения мертвых все равно
+        перезапишет emit(), а так нет временных массивов на каждый кадр.
+        """
+        self.vy += GRAVITY
+        self.vx += self.spin
+        self.x += self.vx
+        self.y += self.vy
+        self.vx *= DAMPING
+        self.vy *= DAMPING
+        self.life -= SPARK_DECAY
+        self.phase += PHASE_STEP
+        self.alive &= self.life > 0
+
+    def draw_list(self, slots, smoke_every=1):
+        """[(x, y, size, alpha, smoke_alpha, rays, rgba)] для отрисовки искр slots.
+
+        smoke_every - дым только у каждой n-й искры (по номеру слота, чтобы
+        дым не мигал между кадрами), 0 - без дыма.
+        """
+        life = self.life[slots]
+        alpha = np.clip(life / self.max_life[slots] * (0.8 + 0.2 * np.sin(self.phase[slots])), 0.0, 1.0)
+        smoke = self.smoke[slots]
+        if smoke_every == 0:
+            smoke = np.zeros_like(smoke)
+        elif smoke_every > 1:
+            smoke = smoke & (slots % smoke_every == 0)
+        smoke_alpha = np.where(smoke, self.smoke_alpha[slots] * life, 0.0)
+        return list(zip(self.x[slots].tolist(), self.y[slots].tolist(), self.size[slots].tolist(),
+                        alpha.tolist(), smoke_alpha.tolist(), self.rays[slots].tolist(),
+                        self.color[slots].tolist()))
+
+    def extent(self, slots):
+        # Дым радиусом size * 3 шире звезды (size * 2 + 1); запас на округление размера в атласе
+        return self.size[slots] * 3 + 2
+
+    def partition(self, left, top, right, bottom):
+        """Живые искры, разделенные за один проход: (внутри прямоугольника, снаружи)."""
+        slots = self.indices()
+        x, y = self.x[slots], self.y[slots]
+        inside = (x >= left) & (x <= right) & (y >= top) & (y <= bottom)
+        return slots[inside], slots[~inside]
+
+
+class FlameArrays(ParticleArrays):
+    FIELDS = (
+        ('x', np.float32), ('y', np.float32), ('size', np.float32), ('life', np.float32), ('phase', np.float32),
+    )
+
+    def emit(self, count, cx, cy):
+        if count <= 0:
+            return
+        rng = self.rng
+        slots = self._allocate(count)
+        self.x[slots] = cx + rng.uniform(-30, 30, count)
+        self.y[slots] = cy + rng.uniform(-30, 30, count)
+        self.size[slots] = rng.uniform(8, 14, count)
+        self.life[slots] = 1.0
+        self.phase[slots] = rng.uniform(0, 2 * math.pi, count)
+
+    def step(self):
+        self.life -= FLAME_DECAY
+        self.size += 0.4 * np.sin(self.phase)
+        self.phase += PHASE_STEP
+        self.alive &= self.life > 0
+
+    def extent(self, slots):
+        return np.abs(self.size[slots]) + 1
+
+    def draw_list(self, slots, variants=1):
+        """[(x, y, size, life, variant)] для отрисовки пламени slots.
+
+        variant - случайный оттенок из variants, заново на каждый кадр (мерцание).
+        """
+        variant = self.rng.integers(0, variants, len(slots))
+        return list(zip(self.x[slots].tolist(), self.y[slots].tolist(), self.size[slots].tolist(),
+                        self.life[slots].tolist(), variant.tolist()))
+
+
+# Искры и пламя вместе: общие для EffectsOverlay и EffectsRenderThread
+
+def has_particles(sparks, flames):
+    return bool(sparks.alive.any() or flames.alive.any())
+
+
+def particles_room(quality, sparks, flames):
+    """Сколько частиц еще можно выпустить в пределах бюджета quality."""
+    return max(0, quality.budget - len(sparks) - len(flames))
+
+
+def particles_bounds(sparks, flames):
+    """Общая рамка (left, top, right, bottom) живых искр и пламени; None, если живых нет."""
+    rects = [b for b in (sparks.bounds(), flames.bounds()) if b is not None]
+    if not rects:
+        return None
+    return (min(r[0] for r in rects), min(r[1] for r in rects),
+            max(r[2] for r in rects), max(r[3] for r in rects))
+
+
+class EffectsQuality:
+    """Уровень качества эффектов по измеренному времени кадра.
+
+    Время шага и отрисовки частиц копится за кадр через add(), end_frame()
+    закрывает кадр. Раз в window кадров среднее сравнивается с целевым
+    кадром target_ms: дороже DEGRADE_SHARE цели - качество на уровень ниже,
+    дешевле UPGRADE_SHARE - на уровень выше. Эффекты делят кадр с остальным
+    GUI, поэтому им отдается только часть цели, а разрыв между порогами не
+    дает уровню прыгать туда-обратно. Если кадры совсем медленные, окно
+    закрывается раньше, чтобы не ждать window тормозящих кадров.
+    """
+    DEGRADE_SHARE = 0.5
+    UPGRADE_SHARE = 0.2
+
+    def __init__(self, target_ms=16.0, window=30, max_particles=MAX_PARTICLES, adaptive=True):
+        self.target_ms = target_ms
+        self.window = window
+        self.max_particles = max_particles
+        # adaptive=False закрепляет level (например, для бенчмарка)
+        self.adaptive = adaptive
+        self.level = QUALITY_FULL
+        self._frame_ms = 0.0
+        self._total_ms = 0.0
+        self._frames = 0
+
+    def add(self, ms):
+        self._frame_ms += ms
+
+    def drop_frame(self):
+        """Забывает недосчитанный кадр (после простоя таймера)."""
+        self._frame_ms = 0.0
+
+    def end_frame(self):
+        self._total_ms += self._frame_ms
+        self._frame_ms = 0.0
+        if not self.adaptive:
+            self._total_ms = 0.0
+            return
+        self._frames += 1
+        limit = self.target_ms * self.DEGRADE_SHARE
+        if self._frames < self.window and self._total_ms <= limit * self.window:
+            return
+        average = self._total_ms / self._frames
+        self._total_ms, self._frames = 0.0, 0
+        if average > limit and self.level < QUALITY_SPARKS_ONLY:
+            self.level += 1
+        elif average < self.target_ms * self.UPGRADE_SHARE and self.level > QUALITY_FULL:
+            self.level -= 1
+
+    @property
+    def name(self):
+        return QUALITY_NAMES[self.level]
+
+    @property
+    def budget(self):
+        return int(self.max_particles * QUALITY_BUDGET[self.level])
+
+    @property
+    def smoke_every(self):
+        return QUALITY_SMOKE_EVERY[self.level]
+
+    @property
+    def flames(self):
+        return self.level < QUALITY_SPARKS_ONLY
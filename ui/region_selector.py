@@ -0,0 +1,61 @@
+from PySide6.QtWidgets import QWidget, QApplication
+from PySide6.QtCore import Qt, QRect, Signal
+from PySide6.QtGui import QPainter, QColor, QPen
+
+
+class RegionSelector(QWidget):
+    """Полупрозрачный оверлей на весь экран для выделения области поиска мышью."""
+    regionSelected = Signal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setCursor(Qt.CrossCursor)
+        screen = QApplication.primaryScreen()
+        self.setGeometry(screen.geometry())
+        self.pixel_ratio = screen.devicePixelRatio()
+        self.origin = None
+        self.current = None
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Escape:
+            self.close()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.origin = event.position().toPoint()
+            self.current = self.origin
+            self.update()
+
+    def mouseMoveEvent(self, event):
+        if self.origin is not None:
+            self.current = event.position().toPoint()
+            self.update()
+
+    def mouseReleaseEvent(self, event):
+        if event.button() != Qt.LeftButton or self.origin is None:
+            return
+        rect = QRect(self.origin, event.position().toPoint()).normalized()
+        # Клик без выделения сбрасывает область на весь экран
+        if rect.width() < 10 or rect.height() < 10:
+            self.regionSelected.emit(None)
+        else:
+            # pyautogui работает в физических пикселях
+            top_left = self.mapToGlobal(rect.topLeft())
+            r = self.pixel_ratio
+            self.regionSelected.emit((int(top_left.x() * r), int(top_left.y() * r),
+                                      int(rect.width() * r), int(rect.height() * r)))
+        self.close()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(0, 0, 0, 80))
+        if self.origin is not None and self.current is not None:
+            rect = QRect(self.origin, self.current).normalized()
+            painter.setCompositionMode(QPainter.CompositionMode_Clear)
+            painter.fillRect(rect, Qt.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+            painter.setPen(QPen(QColor("#34C759"), 2))
+            painter.drawRect(rect)
@@ -0,0 +1,143 @@
+import math
+from PySide6.QtCore import Qt, QPointF
+from PySide6.QtGui import QPainter, QPixmap, QImage, QPen, QColor, QPainterPath, QRadialGradient
+
+# Шаг, с которым округляются размеры спрайтов
+SIZE_STEP = 0.5
+# Оттенки пламени: зеленая компонента (255, g, 20), раньше выбиралась randint(120, 220)
+FLAME_GREENS = (120, 140, 160, 180, 200, 220)
+SMOKE_COLOR = QColor(80, 80, 80)
+
+
+class SpriteAtlas:
+    """Заранее отрисованные спрайты искр, дыма и пламени.
+
+    Звезда искры, клуб дыма и язык пламени рисуются один раз в QPixmap для
+    каждой корзины размера (шаг SIZE_STEP) и цвета, а в кадре остается
+    drawPixmap с прозрачностью частицы. Цвет искр округляется до 16 уровней
+    на канал: набор звезд перестраивается, только когда цвет счетчика
+    переходит в другую корзину.
+
+    images=True хранит спрайты в QImage: так атлас можно использовать вне
+    GUI-потока (см. EffectsRenderThread), где QPixmap недоступен.
+    """
+    MAX_COLORS = 4
+
+    def __init__(self, images=False):
+        self.images = images
+        self.dpr = 1.0
+        # {ключ цвета: {(лучи, размер): (pixmap, половина стороны)}}
+        self._stars = {}
+        self._smoke = {}
+        self._flames = {}
+
+    def set_device_pixel_ratio(self, dpr):
+        if dpr != self.dpr:
+            self.dpr = dpr
+            self._stars, self._smoke, self._flames = {}, {}, {}
+
+    @staticmethod
+    def color_key(rgba):
+        return rgba & 0xFFF0F0F0
+
+    @staticmethod
+    def _bucket(size):
+        return max(SIZE_STEP, round(size / SIZE_STEP) * SIZE_STEP)
+
+    def _canvas(self, half):
+        side = max(1, math.ceil(2 * half * self.dpr))
+        pixmap = QImage(side, side, QImage.Format_ARGB32_Premultiplied) if self.images else QPixmap(side, side)
+        pixmap.setDevicePixelRatio(self.dpr)
+        pixmap.fill(Qt.transparent)
+        return pixmap
+
+    def star(self, rgba, rays, size):
+        key = self.color_key(rgba)
+        stars = self._stars.get(key)
+        if stars is None:
+            if len(self._stars) >= self.MAX_COLORS:
+                self._stars.pop(next(iter(self._stars)))
+            stars = self._stars[key] = {}
+        size = self._bucket(size)
+        sprite = stars.get((rays, size))
+        if sprite is None:
+            # Луч длиной size * 1.5 плюс квадратный конец пера толщиной size / 2
+            half = size * 1.5 + size / 2 + 1
+            pixmap = self._canvas(half)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            color = QColor.fromRgba(key | 0x00080808)
+            color.setAlpha(255)
+            painter.setPen(QPen(color, size / 2))
+            path = QPainterPath()
+            for i in range(rays):
+                angle = math.radians(i * (360 / rays))
+                length = size * (1.5 if i % 2 == 0 else 0.8)
+                path.moveTo(half, half)
+                path.lineTo(half + length * math.cos(angle), half + length * math.sin(angle))
+            painter.drawPath(path)
+            painter.end()
+            sprite = stars[(rays, size)] = (pixmap, half)
+        return sprite
+
+    def smoke(self, radius):
+        radius = self._bucket(radius)
+        sprite = self._smoke.get(radius)
+        if sprite is None:
+            pixmap = self._canvas(radius)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            gradient = QRadialGradient(radius, radius, radius)
+            gradient.setColorAt(0, SMOKE_COLOR)
+            gradient.setColorAt(1, QColor(0, 0, 0, 0))
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(gradient)
+            painter.drawEllipse(QPointF(radius, radius), radius, radius)
+            painter.end()
+            sprite = self._smoke[radius] = (pixmap, radius)
+        return sprite
+
+    def flame(self, size, variant):
+        size = self._bucket(size)
+        sprite = self._flames.get((size, variant))
+        if sprite is None:
+            pixmap = self._canvas(size)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            gradient = QRadialGradient(size, size, size)
+            gradient.setColorAt(0, QColor(255, FLAME_GREENS[variant], 20))
+            gradient.setColorAt(1, QColor(255, 50, 0, 0))
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(gradient)
+            painter.drawEllipse(QPointF(size, size), size, size)
+            painter.end()
+            sprite = self._flames[(size, variant)] = (pixmap, size)
+        return sprite
+
+    def draw_sparks(self, painter, draw_list, dx=0.0, dy=0.0, rgba=None):
+        """Рисует искры из SparkArrays.draw_list со сдвигом (dx, dy); rgba задает общий цвет."""
+        opacity = painter.opacity()
+        draw = painter.drawImage if self.images else painter.drawPixmap
+        # Сначала весь дым, потом звезды - порядок слоев как у одиночной искры
+        for x, y, size, _, smoke_alpha, _, _ in draw_list:
+            if smoke_alpha > 0:
+                pixmap, half = self.smoke(size * 3)
+                painter.setOpacity(opacity * smoke_alpha)
+                draw(QPointF(x + dx - half, y + dy - half), pixmap)
+        for x, y, size, alpha, _, rays, color in draw_list:
+            pixmap, half = self.star(color if rgba is None else rgba, rays, size)
+            painter.setOpacity(opacity * alpha)
+            draw(QPointF(x + dx - half, y + dy - half), pixmap)
+        painter.setOpacity(opacity)
+
+    def draw_flames(self, painter, draw_list):
+        """Рисует пламя из FlameArrays.draw_list."""
+        opacity = painter.opacity()
+        draw = painter.drawImage if self.images else painter.drawPixmap
+        for x, y, size, life, variant in draw_list:
+            if size <= 0:
+                continue
+            pixmap, half = self.flame(size, variant)
+            painter.setOpacity(opacity * life * 0.9)
+            draw(QPointF(x - half, y - half), pixmap)
+        painter.setOpacity(opacity)
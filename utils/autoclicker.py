@@ -1,62 +1,203 @@
-import cv2
+import os
 import pyautogui
-import numpy as np
 import time
-import threading
-from PySide6.QtWidgets import QFileDialog
+import json
+import keyboard
+from PySide6.QtCore import QObject, Qt, Signal
+from PySide6.QtWidgets import QFileDialog, QInputDialog
+from utils.helpers import data_path
+from utils.click_telemetry import ClickTelemetry
+from utils.match_engine import MatchEngine
+from utils.match_worker import MatchWorkerProcess
+from utils.autoclicker_thread import AutoClickerThread
+from utils.rule_engine import RuleEngine
+from utils.capture_service import CaptureService, SharedCaptureBackend
+
+class AutoClicker(QObject):
+    # Состояние для GUI: запущен ли автокликер и есть ли активные шаблоны
+    running_changed = Signal(bool)
+    templates_changed = Signal(bool)
+    # Правило 'increment_counter' сработало; испускается из потока автокликера
+    increment_counter = Signal()
 
-class AutoClicker:
     def __init__(self):
-        self.running = False
-        self.button_template = None
-        self.switch = None
+        super().__init__()
+        self.click_thread = None
+        # Номер запуска: сигналы старого потока приходят с опозданием, и по нему их отличают от сигналов нового
+        self._generation = 0
+        self.settings_file = data_path('autoclicker.json')
+        settings = self._load_settings()
+        # 'thread' - поиск в потоке GUI-процесса, 'process' - в отдельном процессе
+        self.worker_mode = settings.get('worker_mode', 'thread')
+        # Показывать задержку клика и долю попаданий рядом с переключателем
+        self.show_telemetry = settings.get('show_telemetry', False)
+        self.telemetry = ClickTelemetry()
+        self.engine = MatchEngine(settings, data_path('templates.json'), data_path('templates'))
+        self.library = self.engine.library
+        # Общий захват экрана: им могут пользоваться и другие функции, кадр снимается один раз на тик
+        self.capture_service = CaptureService(self.engine.capture_backend, multi_monitor=self.engine.multi_monitor)
+        self.rules = RuleEngine(data_path('rules.json'))
+        self.worker = None
+
+    def _load_settings(self):
+        try:
+            with open(self.settings_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            print(f'Ошибка: файл {self.settings_file} поврежден: {e}')
+            return {}
+
+    def _save_settings(self):
+        settings = self.engine.settings()
+        settings['worker_mode'] = self.worker_mode
+        settings['show_telemetry'] = self.show_telemetry
+        try:
+            with open(self.settings_file, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            print(f'Ошибка сохранения autoclicker.json: {e}')
 
-    def set_switch(self, switch):
-        self.switch = switch
+    @property
+    def running(self):
+        return self.click_thread is not None
+
+    def set_roi(self, roi):
+        """Задает область поиска (x, y, w, h); None - искать по всему экрану."""
+        self.engine.set_roi(roi)
+        self._save_settings()
+        if self.worker:
+            self.worker.send(('roi', self.engine.roi))
 
     def load_template(self):
         file_path, _ = QFileDialog.getOpenFileName(None, "Выберите изображение кнопки", "",
                                                    "Image files (*.png *.jpg *.jpeg)")
-        if file_path:
-            self.button_template = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
-            if self.button_template is not None:
-                if self.switch:
-                    self.switch.update_style(True)
-            else:
-                self.button_template = None
-                if self.switch:
-                    self.switch.update_style(False)
-
-    def click_button(self):
-        while self.running:
-            if self.button_template is None:
-                if self.switch:
-                    self.switch.update_style(False)
-                self.running = False
-                return
-            screenshot = pyautogui.screenshot()
-            screenshot = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2GRAY)
-            if screenshot.shape[0] < self.button_template.shape[0] or screenshot.shape[1] < self.button_template.shape[
-                1]:
-                if self.switch:
-                    self.switch.update_style(False)
-                self.running = False
-                return
-            result = cv2.matchTemplate(screenshot, self.button_template, cv2.TM_CCOEFF_NORMED)
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-            if max_val > 0.8:
-                x, y = max_loc
-                pyautogui.click(x + self.button_template.shape[1] // 2, y + self.button_template.shape[0] // 2)
-            time.sleep(1)
+        if not file_path:
+            return
+        default_name = os.path.splitext(os.path.basename(file_path))[0]
+        name, ok = QInputDialog.getText(None, "Шаблон кнопки", "Название шаблона:", text=default_name)
+        if not ok or not name.strip():
+            return
+        entry = self.library.add(name.strip(), file_path)
+        self.engine.invalidate_frames()
+        if self.worker:
+            self.worker.send('reload')
+        if entry is None:
+            print(f'Ошибка: не удалось загрузить изображение {file_path}')
+        self.templates_changed.emit(self.has_templates())
+
+    def has_templates(self):
+        return bool(self.library.active())
+
+    def stats(self):
+        """Скользящая статистика тиков и кликов, см. ClickTelemetry."""
+        return self.telemetry.stats()
+
+    def telemetry_text(self):
+        """Короткая строка для индикатора: медиана задержки клика, доля попаданий
+        и доля кадров, пропущенных без изменений."""
+        stats = self.telemetry.stats()
+        if not stats['ticks']:
+            return ''
+        latency = f'{stats["latency"]["p50"]:.0f}ms' if stats['latency']['count'] else '—'
+        return f'{latency} {stats["hit_rate"]:.0%} skip {stats["skip_rate"]:.0%}'
+
+    def _click(self, x, y, started):
+        click_started = time.perf_counter()
+        pyautogui.click(x, y)
+        self.telemetry.record_click(started, click_started, time.perf_counter())
+
+    def _apply_rules(self, hits, started):
+        """hits - [(template, click_x, click_y, appeared)] одного кадра в порядке приоритета."""
+        for rule, x, y in self.rules.evaluate(hits, time.monotonic()):
+            if rule.action == 'click':
+                self._click(x, y, started)
+            elif rule.action == 'hotkey':
+                keyboard.send(rule.keys)
+            elif rule.action == 'increment_counter':
+                self.increment_counter.emit()
+
+    def click_button(self, stop_event):
+        """Цикл режима 'thread': поиск и правила. Возвращает False, если не осталось активных шаблонов."""
+        self.engine.reset()
+        while not stop_event.is_set():
+            if not self.has_templates():
+                return False
+            hits, _ = self.engine.step()
+            timings = self.engine.last_timings
+            self.telemetry.record_tick(timings, bool(hits))
+            if hits:
+                self._apply_rules([(entry.name,) + entry.click_point(*hit) + (entry.appeared,)
+                                   for entry, hit in hits], timings['started'])
+            stop_event.wait(self.engine.next_delay())
+        return True
+
+    def click_from_worker(self, worker, stop_event):
+        """Цикл режима 'process': только ждет результаты дочернего процесса и выполняет правила."""
+        while not stop_event.is_set() and worker.is_alive():
+            result = worker.recv(0.05)
+            if not result:
+                continue
+            results, timings = result
+            self.telemetry.record_tick(timings, bool(results))
+            if results:
+                # perf_counter общий для процессов одной машины, started из дочернего процесса сравним с нашим
+                self._apply_rules(results, timings['started'])
+
+    def _start(self):
+        # Всегда не больше одного потока: старый останавливается до запуска нового
+        self._stop()
+        self.telemetry.reset()
+        # Правила правятся в data/rules.json и подхватываются при каждом запуске
+        self.rules.load()
+        if self.worker_mode == 'process':
+            # Процесс запускается в потоке автокликера; если не запустится, переключатель выключится
+            self.worker = MatchWorkerProcess(self.engine.settings(), self.library.library_file,
+                                             self.library.templates_dir)
+        else:
+            self.engine.set_capture(SharedCaptureBackend(self.capture_service, self.engine.min_poll_interval))
+        self._generation += 1
+        generation = self._generation
+        self.click_thread = AutoClickerThread(self, self.worker)
+        # sender() для этого не годится: новый поток может получить адрес уже удаленного старого
+        self.click_thread.templates_missing.connect(lambda: self._on_templates_missing(generation),
+                                                    Qt.QueuedConnection)
+        self.click_thread.finished.connect(lambda: self._on_thread_finished(generation), Qt.QueuedConnection)
+        self.click_thread.start()
+        return True
+
+    def _stop(self):
+        if self.click_thread:
+            self.click_thread.stop()
+            # Пауза прерывается сразу, ждать приходится только текущий тик
+            self.click_thread.wait()
+            self.click_thread = None
+            # Отписка от общего захвата, чтобы сервис не снимал экран впустую
+            self.engine.set_capture(None)
+        if self.worker:
+            self.worker.stop()
+            self.worker = None
+
+    def _current(self, generation):
+        """Сигнал пришел от потока текущего запуска, и его не останавливали."""
+        thread = self.click_thread
+        return generation == self._generation and thread is not None and not thread.stop_event.is_set()
+
+    def _on_templates_missing(self, generation):
+        # Сигнал мог прийти от уже замененного потока
+        if self._current(generation):
+            self.toggle(False)
+
+    def _on_thread_finished(self, generation):
+        # Цикл закончился сам (ошибка, процесс поиска умер): переключатель не должен остаться включенным
+        if self._current(generation):
+            self.toggle(False)
 
     def toggle(self, checked):
-        self.running = checked
-        if self.running:
-            if self.button_template is None:
-                self.switch.update_style(False)
-                self.running = False
-            else:
-                self.switch.update_style(True)
-                threading.Thread(target=self.click_button, daemon=True).start()
+        if checked:
+            running = self.has_templates() and self._start()
         else:
-            self.switch.update_style(self.button_template is not None)
\ No newline at end of file
+            self._stop()
+            running = False
+        self.running_changed.emit(running)
@@ -0,0 +1,38 @@
+import threading
+from PySide6.QtCore import QThread, Signal
+
+
+class AutoClickerThread(QThread):
+    """Цикл автокликера в отдельном потоке.
+
+    Пауза между тиками ждет на событии, поэтому stop() прерывает ее сразу,
+    а не после полного интервала опроса. GUI не трогается: о завершении
+    поток сообщает сигналами. Встроенный finished приходит при любом выходе
+    из run(), в том числе после ошибки или смерти процесса поиска; stop_event
+    показывает, был ли выход запрошен.
+    """
+    templates_missing = Signal()
+
+    def __init__(self, autoclicker, worker=None):
+        super().__init__()
+        self.autoclicker = autoclicker
+        # MatchWorkerProcess в режиме 'process', иначе поиск идет в этом потоке
+        self.worker = worker
+        self.stop_event = threading.Event()
+
+    def run(self):
+        try:
+            if self.worker:
+                # Запуск процесса с загрузкой шаблонов идет здесь, а не в GUI-потоке
+                if not self.worker.start(cancel=self.stop_event):
+                    return
+                self.autoclicker.click_from_worker(self.worker, self.stop_event)
+                if not self.stop_event.is_set():
+                    print('Процесс поиска автокликера завершился')
+            elif not self.autoclicker.click_button(self.stop_event):
+                self.templates_missing.emit()
+        except Exception as e:
+            print(f'Ошибка в потоке автокликера: {e}')
+
+    def stop(self):
+        self.stop_event.set()
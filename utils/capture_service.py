@@ -0,0 +1,324 @@
+import time
+import threading
+import numpy as np
+from utils.screen_capture import CaptureBackend, create_capture_backend
+
+
+def _clip(region, bounds):
+    """Пересечение двух прямоугольников (x, y, w, h) или None."""
+    x0, y0 = max(region[0], bounds[0]), max(region[1], bounds[1])
+    x1 = min(region[0] + region[2], bounds[0] + bounds[2])
+    y1 = min(region[1] + region[3], bounds[1] + bounds[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+class SharedFrame:
+    """Кадр из кольца CaptureService: по серому кадру на каждую снятую область.
+
+    frames - [(region, view)], view только для чтения и без копирования;
+    области лежат каждая на своем мониторе и покрывают то, что просили
+    подписчики. monitors - все мониторы рабочего стола.
+    Кадр действителен, пока его слот не перезаписан (см. valid()).
+    """
+
+    def __init__(self, service, seq, timestamp, frames, monitors):
+        self.service = service
+        self.seq = seq
+        # time.perf_counter() начала захвата
+        self.timestamp = timestamp
+        self.frames = frames
+        self.monitors = monitors
+
+    def valid(self):
+        # Слот seq + slots начинает перезаписываться, пока service.seq еще на единицу меньше
+        return self.service.seq - self.seq < self.service.slots - 1
+
+    def age(self):
+        return time.perf_counter() - self.timestamp
+
+    def crop(self, region):
+        """Часть кадра (x, y, w, h) в координатах экрана или None, если она не лежит на одном мониторе."""
+        x, y, w, h = region
+        for (fx, fy, fw, fh), view in self.frames:
+            if fx <= x and fy <= y and x + w <= fx + fw and y + h <= fy + fh:
+                return view[y - fy:y - fy + h, x - fx:x - fx + w]
+        return None
+
+    def covers(self, regions):
+        """Снята ли каждая часть regions, лежащая на мониторах (None - все мониторы целиком)."""
+        if regions is None:
+            regions = self.monitors
+        for region in regions:
+            for monitor in self.monitors:
+                part = _clip(region, monitor)
+                if part is not None and self.crop(part) is None:
+                    return False
+        return True
+
+
+class Subscription:
+    """Потребитель кадров CaptureService.
+
+    interval - как часто сервис сам снимает кадр для этого потребителя
+    (None - только по запросу через fresh()). regions - области экрана
+    (x, y, w, h), которые ему нужны (None - все мониторы целиком).
+    """
+
+    def __init__(self, service, interval=None, regions=None):
+        self.service = service
+        self.interval = interval
+        self.regions = regions
+        self.last_seq = -1
+
+    def set_regions(self, regions):
+        with self.service._cond:
+            self.regions = None if regions is None else [tuple(r) for r in regions]
+
+    def latest(self):
+        return self.service.latest()
+
+    def wait(self, timeout=None):
+        """Ждет кадр новее последнего полученного этим потребителем."""
+        frame = self.service.wait_after(self.last_seq, timeout)
+        if frame is not None:
+            self.last_seq = frame.seq
+        return frame
+
+    def fresh(self, max_age, timeout=1.0):
+        """Последний кадр, если он не старше max_age секунд и покрывает regions, иначе снимает новый."""
+        frame = self.service.latest()
+        if frame is None or frame.age() > max_age or not frame.covers(self.regions):
+            seq = frame.seq if frame is not None else -1
+            self.service.request()
+            frame = self.service.wait_after(seq, timeout)
+        if frame is not None:
+            self.last_seq = frame.seq
+        return frame
+
+    def close(self):
+        self.service.unsubscribe(self)
+
+
+class CaptureService:
+    """Один захват экрана на тик для всех потребителей.
+
+    Поток сервиса снимает в слот кольца из slots кадров объединение
+    областей, которые просят подписчики (на каждом мониторе - охватывающий
+    их прямоугольник), и будит подписчиков. Потребители (автокликер, OCR и
+    т.п.) получают SharedFrame с представлениями только для чтения, поэтому,
+    сколько бы их ни было, экран снимается один раз. Поток работает, пока
+    есть подписчики.
+    """
+
+    def __init__(self, backend_name='auto', slots=4, multi_monitor=True):
+        self.backend_name = backend_name
+        self.slots = slots
+        self.multi_monitor = multi_monitor
+        self.seq = -1
+        self._cond = threading.Condition()
+        self._subscriptions = []
+        self._requested = False
+        self._closing = False
+        self._thread = None
+        self._latest = None
+        self._last_capture = 0.0
+        # Буферы кольца: [слот][монитор] -> плоский массив, растет только вверх
+        self._buffers = [[] for _ in range(slots)]
+
+    def subscribe(self, interval=None, regions=None):
+        subscription = Subscription(self, interval, regions)
+        with self._cond:
+            self._subscriptions.append(subscription)
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._cond:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            if self._subscriptions or self._thread is None:
+                return
+            thread, self._thread = self._thread, None
+            self._closing = True
+            self._cond.notify_all()
+        thread.join()
+
+    def close(self):
+        for subscription in list(self._subscriptions):
+            self.unsubscribe(subscription)
+
+    def latest(self):
+        with self._cond:
+            return self._latest
+
+    def request(self):
+        """Просит снять кадр вне расписания."""
+        with self._cond:
+            self._requested = True
+            self._cond.notify_all()
+
+    def wait_after(self, seq, timeout=None):
+        """Ждет кадр с номером больше seq; None по таймауту."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._latest is None or self._latest.seq <= seq:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            return self._latest
+
+    def _next_due(self):
+        """Секунды до следующего захвата по расписанию; None - расписания нет."""
+        intervals = [s.interval for s in self._subscriptions if s.interval]
+        if not intervals:
+            return None
+        return max(0.0, self._last_capture + min(intervals) - time.perf_counter())
+
+    def _areas(self, monitors):
+        """Что снимать: на каждом мониторе прямоугольник, охватывающий области подписчиков."""
+        regions = []
+        for subscription in self._subscriptions:
+            if subscription.regions is None:
+                return list(monitors)
+            regions.extend(subscription.regions)
+        areas = []
+        for monitor in monitors:
+            parts = [part for part in (_clip(r, monitor) for r in regions) if part is not None]
+            if not parts:
+                continue
+            left, top = min(p[0] for p in parts), min(p[1] for p in parts)
+            right, bottom = max(p[0] + p[2] for p in parts), max(p[1] + p[3] for p in parts)
+            areas.append((left, top, right - left, bottom - top))
+        return areas
+
+    def _run(self):
+        backend = create_capture_backend(self.backend_name)
+        try:
+            monitors = backend.monitors() if self.multi_monitor else [(0, 0) + tuple(backend.screen_size())]
+            monitors = [tuple(m) for m in monitors]
+            while True:
+                with self._cond:
+                    while not self._closing and not self._requested:
+                        delay = self._next_due()
+                        if delay == 0.0:
+                            break
+                        self._cond.wait(delay)
+                    if self._closing:
+                        return
+                    self._requested = False
+                    areas = self._areas(monitors)
+                self._capture(backend, areas, monitors)
+        finally:
+            backend.close()
+
+    def _capture(self, backend, areas, monitors):
+        slot = (self.seq + 1) % self.slots
+        started = time.perf_counter()
+        buffers = self._buffers[slot]
+        frames = []
+        for index, region in enumerate(areas):
+            w, h = region[2], region[3]
+            if len(buffers) <= index:
+                buffers.append(np.empty(0, dtype=np.uint8))
+            if buffers[index].size < w * h:
+                buffers[index] = np.empty(w * h, dtype=np.uint8)
+            out = buffers[index][:w * h].reshape(h, w)
+            try:
+                backend.grab(region, out)
+            except OSError as e:
+                print(f'Ошибка захвата экрана: {e}')
+                continue
+            view = out.view()
+            view.flags.writeable = False
+            frames.append((tuple(region), view))
+        with self._cond:
+            self._last_capture = started
+            # Кадр публикуется, даже если снимать было нечего: ждущие fresh() не должны висеть
+            if frames or not areas:
+                self.seq += 1
+                self._latest = SharedFrame(self, self.seq, started, frames, monitors)
+            self._cond.notify_all()
+
+
+class SharedCaptureBackend(CaptureBackend):
+    """Бэкенд захвата для MatchEngine поверх CaptureService.
+
+    begin_frame(regions) в начале тика сообщает сервису области тика и
+    берет общий кадр (или просит новый, если последний старше max_age или не
+    покрывает их), grab() вырезает из него нужную область без копирования.
+    Если задан out, область копируется в него. Серый кадр сервис уже
+    подготовил, поэтому convert_time здесь - время вырезания и копирования.
+    """
+    name = 'shared'
+    shared = True
+
+    def __init__(self, service, max_age=0.05):
+        super().__init__()
+        self.subscription = service.subscribe()
+        self.max_age = max_age
+        self.frame = None
+
+    def begin_frame(self, regions=None):
+        if regions is not None:
+            self.subscription.set_regions(regions)
+        self.frame = self.subscription.fresh(self.max_age)
+
+    def screen_size(self):
+        x, y, w, h = self._desktop()
+        return x + w, y + h
+
+    def monitors(self):
+        if self.frame is None:
+            self.begin_frame()
+        if self.frame is None:
+            return super().monitors()
+        return list(self.frame.monitors)
+
+    def _desktop(self):
+        if self.frame is None:
+            self.begin_frame()
+        if self.frame is None:
+            raise OSError('Сервис захвата не вернул кадр')
+        regions = self.frame.monitors
+        left, top = min(r[0] for r in regions), min(r[1] for r in regions)
+        right, bottom = max(r[0] + r[2] for r in regions), max(r[1] + r[3] for r in regions)
+        return left, top, right - left, bottom - top
+
+    def grab(self, region=None, out=None):
+        if self.frame is None or not self.frame.valid():
+            self.begin_frame()
+        if self.frame is None:
+            raise OSError('Сервис захвата не вернул кадр')
+        started = time.perf_counter()
+        view = self._crop(self._full_region(region), out)
+        self.convert_time = time.perf_counter() - started
+        return view
+
+    def _crop(self, region, out):
+        x, y, w, h = region
+        view = self.frame.crop((x, y, w, h))
+        if view is None:
+            # Область на стыке мониторов: собираем из частей
+            view = self._gray_view(w, h, out)
+            view[...] = 0
+            for (fx, fy, fw, fh), frame in self.frame.frames:
+                x0, y0 = max(x, fx), max(y, fy)
+                x1, y1 = min(x + w, fx + fw), min(y + h, fy + fh)
+                if x1 > x0 and y1 > y0:
+                    view[y0 - y:y1 - y, x0 - x:x1 - x] = frame[y0 - fy:y1 - fy, x0 - fx:x1 - fx]
+            return view
+        if out is not None:
+            gray = self._gray_view(w, h, out)
+            gray[...] = view
+            return gray
+        return view
+
+    def close(self):
+        self.subscription.close()
@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+import numpy as np
+
+# Границы корзин гистограмм задержек, мс
+LATENCY_BINS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Границы корзин гистограммы оценки совпадения
+SCORE_BINS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+STAGES = ('capture', 'convert', 'match', 'click', 'latency', 'on_screen')
+# Исходы проверки изменений кадра, см. MatchEngine.last_timings['frames']
+FRAME_KINDS = ('skipped', 'partial', 'full')
+
+
+class RollingHistogram:
+    """Последние window значений с перцентилями и гистограммой по заданным границам."""
+
+    def __init__(self, bins, window=500):
+        self.bins = bins
+        self.values = deque(maxlen=window)
+
+    def add(self, value):
+        self.values.append(value)
+
+    def clear(self):
+        self.values.clear()
+
+    def summary(self):
+        if not self.values:
+            return {'count': 0}
+        values = np.fromiter(self.values, dtype=np.float64, count=len(self.values))
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        # Последняя корзина - все, что больше верхней границы
+        counts = np.bincount(np.searchsorted(self.bins, values), minlength=len(self.bins) + 1)
+        return {
+            'count': len(values),
+            'mean': round(float(values.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p90': round(float(p90), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(values.max()), 3),
+            'histogram': [int(c) for c in counts]
+        }
+
+
+class ClickTelemetry:
+    """Скользящая статистика тиков автокликера: время этапов, оценка совпадения, доля попаданий.
+
+    Этапы (мс): capture - захват, convert - перевод в серый, match - поиск,
+    click - сам клик, latency - от начала захвата кадра с кнопкой до конца
+    клика, on_screen - верхняя оценка того, сколько кнопка была на экране до
+    клика (от начала предыдущего тика). frames - сколько захваченных кадров
+    пропущено без изменений, сравнено частично и целиком. Пишется из потока автокликера,
+    читается из GUI, поэтому все под одной блокировкой.
+    """
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self.stages = {stage: RollingHistogram(LATENCY_BINS_MS, window) for stage in STAGES}
+        self.score = RollingHistogram(SCORE_BINS, window)
+        self.ticks = 0
+        self.matched_ticks = 0
+        self.hit_ticks = 0
+        self.frames = dict.fromkeys(FRAME_KINDS, 0)
+        # Начало текущего и предыдущего тика: кнопка, найденная в текущем, появилась после предыдущего
+        self._tick_started = None
+        self._prev_started = None
+
+    def reset(self):
+        with self._lock:
+            for histogram in self.stages.values():
+                histogram.clear()
+            self.score.clear()
+            self.ticks = self.matched_ticks = self.hit_ticks = 0
+            self.frames = dict.fromkeys(FRAME_KINDS, 0)
+            self._tick_started = self._prev_started = None
+
+    def record_tick(self, timings, hit):
+        """Учитывает тик по MatchEngine.last_timings; hit - было ли попадание в этом тике."""
+        if timings is None:
+            return
+        with self._lock:
+            self.ticks += 1
+            self.stages['capture'].add(timings['capture'] * 1000)
+            self.stages['convert'].add(timings['convert'] * 1000)
+            if timings['matched']:
+                self.matched_ticks += 1
+                self.stages['match'].add(timings['match'] * 1000)
+                if timings['scores']:
+                    self.score.add(max(timings['scores'].values()))
+            if hit:
+                self.hit_ticks += 1
+            for kind, count in timings.get('frames', {}).items():
+                self.frames[kind] += count
+            self._prev_started, self._tick_started = self._tick_started, timings['started']
+
+    def record_click(self, started, click_started, click_finished):
+        """started - начало захвата кадра, по которому кликнули (time.perf_counter)."""
+        with self._lock:
+            self.stages['click'].add((click_finished - click_started) * 1000)
+            self.stages['latency'].add((click_finished - started) * 1000)
+            if self._prev_started is not None:
+                self.stages['on_screen'].add((click_finished - self._prev_started) * 1000)
+
+    def stats(self):
+        with self._lock:
+            stats = {stage: histogram.summary() for stage, histogram in self.stages.items()}
+            stats['score'] = self.score.summary()
+            stats['ticks'] = self.ticks
+            stats['hit_rate'] = round(self.hit_ticks / self.matched_ticks, 3) if self.matched_ticks else 0.0
+            frames = sum(self.frames.values())
+            stats['frames'] = dict(self.frames)
+            stats['skip_rate'] = round(self.frames['skipped'] / frames, 3) if frames else 0.0
+            stats['latency_bins_ms'] = list(LATENCY_BINS_MS)
+            stats['score_bins'] = list(SCORE_BINS)
+        return stats
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+
+UNCHANGED = 'unchanged'
+PARTIAL = 'partial'
+FULL = 'full'
+
+
+class FrameChangeDetector:
+    """Дешевая проверка, изменился ли кадр с прошлого тика.
+
+    Кадр сжимается до средних яркостей плиток tile_size x tile_size и
+    сравнивается с предыдущим. Плитки, где среднее сдвинулось больше чем на
+    threshold, считаются грязными и объединяются в прямоугольники.
+    """
+
+    def __init__(self, tile_size=16, threshold=2, full_ratio=0.5):
+        self.tile_size = tile_size
+        self.threshold = threshold
+        # Если грязных плиток больше этой доли, дешевле сравнить весь кадр
+        self.full_ratio = full_ratio
+        self.prev = None
+        self.prev_region = None
+
+    def reset(self):
+        self.prev = None
+        self.prev_region = None
+
+    def detect(self, frame, region):
+        """Возвращает (состояние, прямоугольники (x, y, w, h) в координатах кадра)."""
+        h, w = frame.shape[:2]
+        small_size = (max(1, -(-w // self.tile_size)), max(1, -(-h // self.tile_size)))
+        small = cv2.resize(frame, small_size, interpolation=cv2.INTER_AREA)
+        prev, prev_region = self.prev, self.prev_region
+        self.prev, self.prev_region = small, tuple(region)
+        if prev is None or prev_region != tuple(region):
+            return FULL, [(0, 0, w, h)]
+
+        dirty = (cv2.absdiff(small, prev) > self.threshold).astype(np.uint8)
+        dirty_count = cv2.countNonZero(dirty)
+        if dirty_count == 0:
+            return UNCHANGED, []
+        if dirty_count > self.full_ratio * dirty.size:
+            return FULL, [(0, 0, w, h)]
+
+        scale_x = w / small_size[0]
+        scale_y = h / small_size[1]
+        count, _, components, _ = cv2.connectedComponentsWithStats(dirty, connectivity=8)
+        rects = []
+        for tx, ty, tw, th, _ in components[1:count]:
+            x0, y0 = int(tx * scale_x), int(ty * scale_y)
+            x1, y1 = min(w, int(np.ceil((tx + tw) * scale_x))), min(h, int(np.ceil((ty + th) * scale_y)))
+            rects.append((x0, y0, x1 - x0, y1 - y0))
+        return PARTIAL, rects
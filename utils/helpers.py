@@ -9,6 +9,16 @@ def resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
+def data_path(filename):
+    """Возвращает путь для данных в папке data (рядом с .exe в собранном виде)."""
+    if hasattr(sys, '_MEIPASS'):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.abspath(".")
+    data_dir = os.path.join(base_path, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
+
 def load_region_tax_data():
     try:
         with open("data/region_tax_data.json", "r", encoding="utf-8") as file:
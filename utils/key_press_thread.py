@@ -6,6 +6,7 @@ class KeyPressThread(QThread):
     increment_counter = Signal()
     toggle_autoclicker = Signal()
     load_template = Signal()
+    select_region = Signal()
 
     def __init__(self, hotkeys, parent_window):
         super().__init__()
@@ -34,6 +35,8 @@ class KeyPressThread(QThread):
                 keyboard.add_hotkey(hotkey, self.toggle_autoclicker.emit)
             elif action == "load_template":
                 keyboard.add_hotkey(hotkey, self.load_template.emit)
+            elif action == "select_region":
+                keyboard.add_hotkey(hotkey, self.select_region.emit)
 
     def _handle_tab_press(self):
         current_time = QDateTime.currentMSecsSinceEpoch()
@@ -0,0 +1,377 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.frame_diff import FrameChangeDetector, UNCHANGED, PARTIAL, FULL
+from utils.poll_scheduler import AdaptivePollScheduler
+from utils.screen_capture import create_capture_backend
+from utils.template_library import TemplateLibrary
+from utils.template_matcher import FramePyramid
+
+
+class MatchEngine:
+    """Захват экрана и поиск шаблонов без GUI.
+
+    Один вызов step() - один тик автокликера. Движок не знает, где он
+    запущен: в потоке AutoClicker или в отдельном процессе MatchWorkerProcess.
+
+    При нескольких мониторах каждый захватывается в свой буфер, а сравнение
+    идет параллельно в небольшом пуле потоков (OpenCV отпускает GIL).
+    Координаты попаданий - в системе виртуального рабочего стола.
+    """
+
+    def __init__(self, settings, library_file, templates_dir):
+        # Статичная область поиска (x, y, w, h) в пикселях экрана, None - весь экран
+        self.roi = tuple(settings['roi']) if settings.get('roi') else None
+        # Окно поиска вокруг последнего найденного места
+        self.search_padding = settings.get('search_padding', 100)
+        self.max_window_misses = settings.get('max_window_misses', 5)
+        # Опрос ускоряется до min_poll_interval при активности и замедляется до max_poll_interval в простое
+        self.min_poll_interval = settings.get('min_poll_interval', 0.05)
+        self.max_poll_interval = settings.get('max_poll_interval', 1.0)
+        # Доля одного ядра, которую можно тратить на захват и сравнение
+        self.cpu_budget = settings.get('cpu_budget', 0.1)
+        self.scheduler = AdaptivePollScheduler(self.min_poll_interval, self.max_poll_interval, self.cpu_budget)
+        self.pyramid_levels = settings.get('pyramid_levels', 2)
+        # 'auto', 'x11' или 'pyautogui'; бэкенд создается в том потоке, где работает движок
+        self.capture_backend = settings.get('capture_backend', 'auto')
+        self.capture = None
+        # Искать на всех мониторах, а не только на основном
+        self.multi_monitor = settings.get('multi_monitor', True)
+        self._monitors = None
+        # Детектор изменений и буфер кадра на каждую область захвата
+        self._detectors = []
+        self._buffers = []
+        self._pool = None
+        # Тайминги последнего тика: {'started', 'capture', 'convert', 'match', 'matched', 'scores', 'frames'}
+        self.last_timings = None
+        # Масштабы шаблонов для смены масштаба ОС или зума браузера (100%/125%/150%)
+        self.template_scales = settings.get('template_scales', [0.67, 0.8, 1.0, 1.25, 1.5])
+        # Фиксация масштаба снимается после стольких промахов подряд (или сразу после
+        # промаха по всей области), а поиск во всех масштабах идет не чаще раза в scale_search_interval секунд
+        self.scale_lock_misses = settings.get('scale_lock_misses', 10)
+        self.scale_search_interval = settings.get('scale_search_interval', 2.0)
+        self.library = TemplateLibrary(library_file, templates_dir, self.pyramid_levels, self.template_scales)
+
+    def settings(self):
+        return {
+            'roi': list(self.roi) if self.roi else None,
+            'search_padding': self.search_padding,
+            'max_window_misses': self.max_window_misses,
+            'min_poll_interval': self.min_poll_interval,
+            'max_poll_interval': self.max_poll_interval,
+            'cpu_budget': self.cpu_budget,
+            'pyramid_levels': self.pyramid_levels,
+            'capture_backend': self.capture_backend,
+            'template_scales': self.template_scales,
+            'scale_lock_misses': self.scale_lock_misses,
+            'scale_search_interval': self.scale_search_interval,
+            'multi_monitor': self.multi_monitor
+        }
+
+    def set_roi(self, roi):
+        self.roi = tuple(roi) if roi else None
+        self.reset_search_window()
+
+    def reset_search_window(self):
+        self.invalidate_frames()
+        for entry in self.library:
+            entry.last_hit = None
+            entry.window_misses = 0
+            entry.reset_scale()
+            # Без места последнего попадания пропажу шаблона не проверить
+            entry.visible = False
+
+    def reset(self):
+        """Сброс перед новым запуском."""
+        self.invalidate_frames()
+        # Мониторы могли подключить или отключить между запусками
+        self._monitors = None
+        self.scheduler.reset()
+        # Масштаб заново определяется по первому попаданию в каждом запуске
+        for entry in self.library:
+            entry.reset_scale()
+            entry.visible = False
+
+    def invalidate_frames(self):
+        """Следующий кадр каждой области считается полностью измененным."""
+        for detector in self._detectors:
+            detector.reset()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self.capture is not None:
+            self.capture.close()
+            self.capture = None
+
+    def set_capture(self, capture):
+        """Подменяет бэкенд захвата (например, на общий SharedCaptureBackend)."""
+        if self.capture is not None:
+            self.capture.close()
+        self.capture = capture
+        # Мониторы и прошлые кадры относятся к старому бэкенду
+        self._monitors = None
+        self.invalidate_frames()
+
+    def _ensure_capture(self):
+        if self.capture is None:
+            self.capture = create_capture_backend(self.capture_backend)
+        return self.capture
+
+    def screen_size(self):
+        return self._ensure_capture().screen_size()
+
+    def monitors(self):
+        if self._monitors is None:
+            capture = self._ensure_capture()
+            if self.multi_monitor:
+                self._monitors = [tuple(m) for m in capture.monitors()]
+            else:
+                self._monitors = [(0, 0) + tuple(capture.screen_size())]
+        return self._monitors
+
+    def desktop_bounds(self):
+        """Общая рамка всех мониторов."""
+        return self._union(self.monitors())
+
+    def _capture_areas(self):
+        """Области захвата: ROI или по одной на каждый монитор."""
+        if self.roi:
+            return [self.roi]
+        return self.monitors()
+
+    @staticmethod
+    def _union(rects):
+        left = min(r[0] for r in rects)
+        top = min(r[1] for r in rects)
+        right = max(r[0] + r[2] for r in rects)
+        bottom = max(r[1] + r[3] for r in rects)
+        return left, top, right - left, bottom - top
+
+    def _search_window(self, entry, bounds):
+        """Окно вокруг последнего попадания шаблона или None, если нужен поиск по всей области."""
+        if entry.last_hit is None or entry.window_misses >= self.max_window_misses:
+            return None
+        th, tw = entry.shape
+        bx, by, bw, bh = bounds
+        left = max(bx, entry.last_hit[0] - self.search_padding)
+        top = max(by, entry.last_hit[1] - self.search_padding)
+        right = min(bx + bw, entry.last_hit[0] + tw + self.search_padding)
+        bottom = min(by + bh, entry.last_hit[1] + th + self.search_padding)
+        if right - left < tw or bottom - top < th:
+            return None
+        return left, top, right - left, bottom - top
+
+    def _search_region(self, entries, bounds):
+        """Область захвата внутри bounds и окна поиска шаблонов (в координатах экрана).
+
+        Шаблон, чье окно поиска лежит на другом мониторе, в windows не попадает.
+        Если у всех оставшихся шаблонов есть окно, захватывается только их общая
+        рамка, иначе вся область bounds. region равен None, если искать нечего.
+        """
+        bx, by, bw, bh = bounds
+        windows = {}
+        for entry in entries:
+            window_active = entry.last_hit is not None and entry.window_misses < self.max_window_misses
+            if window_active and not (bx <= entry.last_hit[0] < bx + bw and by <= entry.last_hit[1] < by + bh):
+                continue
+            windows[entry.name] = self._search_window(entry, bounds)
+        if not windows:
+            return None, windows
+        if any(window is None for window in windows.values()):
+            return bounds, windows
+        return self._union(list(windows.values())), windows
+
+    @staticmethod
+    def _dirty_areas(area, dirty, th, tw):
+        """Части области area, задетые изменениями, с запасом на размер шаблона."""
+        ax, ay, aw, ah = area
+        areas = []
+        for x, y, w, h in dirty:
+            x0, y0 = max(ax, x - tw), max(ay, y - th)
+            x1, y1 = min(ax + aw, x + w + tw), min(ay + ah, y + h + th)
+            if x1 - x0 >= tw and y1 - y0 >= th:
+                areas.append((x0, y0, x1 - x0, y1 - y0))
+        return areas
+
+    def _match_entries(self, entries, screenshot, region, windows, dirty=None):
+        """Сравнивает шаблоны с одним кадром, ничего не меняя в самих шаблонах.
+
+        Возвращает [(entry, score, (x, y), scale, whole)] с координатами
+        экрана; whole - сравнивалась вся область целиком. dirty - измененные прямоугольники кадра; если заданы, шаблоны
+        ищутся только в них. Вызывается параллельно для разных мониторов.
+        """
+        rx, ry = region[:2]
+        pyramid = FramePyramid(screenshot)
+        results = []
+        for entry in entries:
+            if entry.name not in windows:
+                continue
+            th, tw = entry.shape
+            window = windows[entry.name]
+            if window:
+                area = (window[0] - rx, window[1] - ry, window[2], window[3])
+            else:
+                area = (0, 0, screenshot.shape[1], screenshot.shape[0])
+            areas = [area] if dirty is None else self._dirty_areas(area, dirty, th, tw)
+            max_val, best, best_scale = -1.0, None, None
+            for ax, ay, aw, ah in areas:
+                if aw < tw or ah < th:
+                    continue
+                if (ax, ay, aw, ah) == (0, 0, screenshot.shape[1], screenshot.shape[0]):
+                    score, (x, y), scale = entry.match(screenshot, pyramid)
+                else:
+                    score, (x, y), scale = entry.match(screenshot[ay:ay + ah, ax:ax + aw])
+                if scale is not None and score > max_val:
+                    max_val, best, best_scale = score, (rx + ax + x, ry + ay + y), scale
+            if best is not None:
+                results.append((entry, max_val, best, best_scale, window is None and dirty is None))
+        return results
+
+    def _detect_and_match(self, index, entries, screenshot, region, windows):
+        state, dirty = self._detectors[index].detect(screenshot, region)
+        if state == UNCHANGED:
+            return state, dirty, []
+        return state, dirty, self._match_entries(entries, screenshot, region, windows,
+                                                 dirty if state == PARTIAL else None)
+
+    @staticmethod
+    def _rechecked(entry, checked):
+        """Место последнего попадания entry заново сравнивалось на этом тике.
+
+        checked - [(region, state, dirty)] захваченных областей. Неизменный
+        кадр ничего не говорит о шаблоне: без попадания он по-прежнему виден.
+        """
+        x, y = entry.last_hit
+        th, tw = entry.shape
+        for (rx, ry, rw, rh), state, dirty in checked:
+            if not (rx <= x < rx + rw and ry <= y < ry + rh):
+                continue
+            if state == FULL:
+                return True
+            for dx, dy, dw, dh in dirty:
+                if rx + dx < x + tw and x < rx + dx + dw and ry + dy < y + th and y < ry + dy + dh:
+                    return True
+        return False
+
+    def _frame_buffer(self, index, width, height):
+        """Свой буфер для каждой области: кадры всех мониторов живут одновременно."""
+        size = width * height
+        if self._buffers[index].size < size:
+            self._buffers[index] = np.empty(size, dtype=np.uint8)
+        return self._buffers[index][:size].reshape(height, width)
+
+    def step(self):
+        """Один тик: захват всех областей, проверка изменений и поиск шаблонов.
+
+        Возвращает (hits, frames), где frames -
+        список (region, frame) для областей, которые удалось захватить.
+        Время этапов тика остается в last_timings.
+        """
+        entries = self.library.active()
+        started = time.perf_counter()
+        for entry in entries:
+            entry.search_all_scales = entry.locked_scale is None and started >= entry.next_scale_search
+        areas = self._capture_areas()
+        if len(self._detectors) != len(areas):
+            self._detectors = [FrameChangeDetector() for _ in areas]
+            self._buffers = [np.empty(0, dtype=np.uint8) for _ in areas]
+
+        # Захват последовательный: соединение с X-сервером не потокобезопасно
+        jobs, frames = [], []
+        capture_time = convert_time = 0.0
+        capture = self._ensure_capture()
+        plans = []
+        for index, bounds in enumerate(areas):
+            region, windows = self._search_region(entries, bounds)
+            if region is not None:
+                plans.append((index, region, windows))
+        # Общий бэкенд снимает кадр здесь, поэтому это тоже время захвата
+        begin_started = time.perf_counter()
+        capture.begin_frame([region for _, region, _ in plans])
+        capture_time += time.perf_counter() - begin_started
+        for index, region, windows in plans:
+            if capture.shared:
+                out = None
+            else:
+                out = self._frame_buffer(index, region[2], region[3])
+            grab_started = time.perf_counter()
+            try:
+                screenshot = capture.grab(region, out)
+            except OSError as e:
+                print(f'Ошибка захвата экрана: {e}')
+                continue
+            capture_time += time.perf_counter() - grab_started - capture.convert_time
+            convert_time += capture.convert_time
+            frames.append((region, screenshot))
+            jobs.append((index, entries, screenshot, region, windows))
+
+        match_started = time.perf_counter()
+        if len(jobs) > 1:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=min(4, len(areas)),
+                                                thread_name_prefix='match')
+            outcomes = list(self._pool.map(lambda job: self._detect_and_match(*job), jobs))
+        else:
+            outcomes = [self._detect_and_match(*job) for job in jobs]
+
+        # Лучший результат каждого шаблона по всем мониторам; окно поиска
+        # у шаблона бывает только на одном мониторе
+        best = {}
+        for _, _, results in outcomes:
+            for result in results:
+                current = best.get(result[0].name)
+                if current is None or result[1] > current[1]:
+                    best[result[0].name] = result
+        self.last_timings = {
+            'started': started,
+            'capture': capture_time,
+            'convert': convert_time,
+            'match': time.perf_counter() - match_started,
+            # Сравнение было хотя бы в одной области (кадр изменился)
+            'matched': any(state != UNCHANGED for state, _, _ in outcomes),
+            'scores': {name: result[1] for name, result in best.items()},
+            # Сколько захваченных областей тика пропущено без изменений, сравнено частично и целиком
+            'frames': {kind: sum(state == value for state, _, _ in outcomes)
+                       for kind, value in (('skipped', UNCHANGED), ('partial', PARTIAL), ('full', FULL))}
+        }
+        # Шаблоны, которые на этом тике искались только в окне вокруг прошлого попадания
+        windowed = {name for job in jobs for name, window in job[4].items() if window is not None}
+        hits = []
+        for entry in entries:
+            result = best.get(entry.name)
+            if result is not None and result[1] > entry.threshold:
+                _, _, loc, scale, _ = result
+                entry.register_hit(loc[0], loc[1], scale)
+                hits.append((entry, entry.last_hit))
+                continue
+            if entry.name in windowed:
+                # Неизменное окно - тоже промах: кнопка могла уйти из окна, и тогда
+                # оно больше не меняется. После max_window_misses промахов снова
+                # ищем по всей области
+                entry.window_misses += 1
+            if result is None:
+                # Шаблон на этом тике не сравнивался
+                continue
+            if entry.search_all_scales:
+                entry.next_scale_search = started + self.scale_search_interval
+            elif entry.locked_scale is not None:
+                # Зум или DPI могли смениться: после промаха по всей области или
+                # scale_lock_misses промахов подряд масштаб ищется заново
+                entry.scale_misses += 1
+                if result[4] or entry.scale_misses >= self.scale_lock_misses:
+                    entry.reset_scale()
+                    # Этот же кадр нужно сравнить во всех масштабах, даже если он больше не изменится
+                    self.invalidate_frames()
+        # Шаблон пропал, только если его место изменилось, а попадания там нет
+        hit_entries = {id(entry) for entry, _ in hits}
+        checked = [(job[3], state, dirty) for job, (state, dirty, _) in zip(jobs, outcomes)]
+        for entry in entries:
+            if entry.visible and id(entry) not in hit_entries and self._rechecked(entry, checked):
+                entry.visible = False
+        self.scheduler.record(time.perf_counter() - started, self.last_timings['matched'] or bool(hits))
+        return hits, frames
+
+    def next_delay(self):
+        return self.scheduler.next_delay()
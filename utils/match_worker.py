@@ -0,0 +1,131 @@
+import time
+import multiprocessing as mp
+from utils.match_engine import MatchEngine
+
+
+def _worker_main(conn, stop_event, settings, library_file, templates_dir):
+    """Цикл дочернего процесса: захват, поиск, отправка результата в pipe."""
+    engine = MatchEngine(settings, library_file, templates_dir)
+    try:
+        engine.reset()
+        conn.send(('ready', None))
+        while not stop_event.is_set():
+            while conn.poll():
+                command = conn.recv()
+                if command == 'reload':
+                    engine.library.load()
+                    engine.reset_search_window()
+                elif isinstance(command, tuple) and command[0] == 'roi':
+                    engine.set_roi(command[1])
+            hits, _ = engine.step()
+            results = [(entry.name,) + entry.click_point(*hit) + (entry.appeared,) for entry, hit in hits]
+            conn.send(('tick', (results, engine.last_timings)))
+            stop_event.wait(engine.next_delay())
+    finally:
+        engine.close()
+        try:
+            conn.send(('stopped', None))
+        except (OSError, BrokenPipeError):
+            pass
+        conn.close()
+
+
+class MatchWorkerProcess:
+    """Захват и поиск шаблонов в отдельном процессе, чтобы не мешать GUI-потоку.
+
+    Результаты тиков приходят через pipe:
+    ([(name, click_x, click_y, appeared), ...], timings), где appeared -
+    шаблон появился на этом тике (TemplateEntry.appeared), timings -
+    MatchEngine.last_timings.
+    """
+
+    def __init__(self, settings, library_file, templates_dir):
+        self.settings = settings
+        self.library_file = library_file
+        self.templates_dir = templates_dir
+        self.process = None
+        # Pipe создается сразу, чтобы команды из GUI (send) не терялись, пока процесс запускается
+        self._ctx = mp.get_context('spawn')
+        self.conn, self._child_conn = self._ctx.Pipe()
+        self.stop_event = self._ctx.Event()
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self, timeout=10.0, cancel=None):
+        """Запускает процесс и ждет, пока он загрузит шаблоны. Возвращает False при неудаче.
+
+        Запуск через spawn занимает секунды, поэтому вызывается не из GUI-потока;
+        cancel - threading.Event, по которому ожидание прерывается.
+        """
+        if self.process is not None:
+            return True
+        self.process = self._ctx.Process(
+            target=_worker_main, daemon=True,
+            args=(self._child_conn, self.stop_event, self.settings, self.library_file, self.templates_dir))
+        self.process.start()
+        self._child_conn.close()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not (cancel is not None and cancel.is_set()):
+            if not self.conn.poll(0.05):
+                if not self.process.is_alive():
+                    break
+                continue
+            try:
+                if self.conn.recv()[0] == 'ready':
+                    return True
+            except EOFError:
+                pass
+            break
+        cancelled = cancel is not None and cancel.is_set()
+        if not cancelled:
+            print('Ошибка: процесс автокликера не запустился')
+        # Отмененный запуск не ждем: процесс еще загружается и ничего не сделал
+        self.stop(timeout=0.0 if cancelled else 2.0)
+        return False
+
+    def recv(self, timeout):
+        """Следующий результат тика или None, если за timeout ничего не пришло."""
+        try:
+            if not self.conn.poll(timeout):
+                return None
+            kind, payload = self.conn.recv()
+        except (EOFError, OSError):
+            return None
+        return payload if kind == 'tick' else None
+
+    def send(self, command):
+        if self.conn is None:
+            return
+        try:
+            self.conn.send(command)
+        except (OSError, BrokenPipeError):
+            pass
+
+    def stop(self, timeout=2.0):
+        """Останавливает процесс и закрывает pipe; безопасно вызывать повторно."""
+        if self.process is None:
+            if self.conn is not None:
+                self.conn.close()
+                self._child_conn.close()
+                self.conn = None
+            return
+        # Event.set() ждет, пока проснутся все, кто ждет события; убитый процесс не проснется
+        if self.process.is_alive():
+            self.stop_event.set()
+        # Вычитываем pipe, чтобы процесс не завис на send() с полным буфером
+        deadline = time.monotonic() + timeout
+        while self.process.is_alive() and time.monotonic() < deadline:
+            try:
+                while self.conn.poll(0.05):
+                    if self.conn.recv()[0] == 'stopped':
+                        break
+            except (EOFError, OSError):
+                pass
+            self.process.join(0.05)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
@@ -0,0 +1,39 @@
+class AdaptivePollScheduler:
+    """Интервал опроса экрана, который подстраивается под активность.
+
+    После изменения экрана или попадания опрос идет с min_interval, в простое
+    интервал растет в backoff раз до max_interval. Дополнительно пауза не
+    бывает короче, чем нужно, чтобы среднее время захвата и сравнения занимало
+    не больше cpu_budget одного ядра.
+    """
+
+    def __init__(self, min_interval=0.05, max_interval=1.0, cpu_budget=0.1, backoff=1.5, smoothing=0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = cpu_budget
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.interval = min_interval
+        self.busy_avg = 0.0
+        self.last_busy = 0.0
+
+    def reset(self):
+        self.interval = self.min_interval
+        self.busy_avg = 0.0
+        self.last_busy = 0.0
+
+    def record(self, busy_time, active):
+        """Учитывает тик: busy_time - секунды на захват и сравнение, active - было ли изменение или попадание."""
+        self.last_busy = busy_time
+        self.busy_avg += self.smoothing * (busy_time - self.busy_avg)
+        if active:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    def next_delay(self):
+        """Сколько спать до следующего тика."""
+        budget_delay = 0.0
+        if 0 < self.cpu_budget < 1:
+            budget_delay = self.busy_avg * (1 - self.cpu_budget) / self.cpu_budget
+        return max(self.interval - self.last_busy, budget_delay, 0.0)
@@ -0,0 +1,141 @@
+import json
+
+ACTIONS = ('click', 'hotkey', 'increment_counter')
+# Шаблон без правил, который остается на экране, кликается повторно не чаще, секунд
+DEFAULT_CLICK_COOLDOWN = 1.0
+
+
+class Rule:
+    """Правило: при найденном шаблоне template выполнить действие action.
+
+    action - 'click' (клик в точку шаблона), 'hotkey' (нажать keys, формат
+    как у горячих клавиш: 'ctrl+enter') или 'increment_counter' (+1 к счетчику
+    тасков). region (x, y, w, h) ограничивает место на экране, где попадание
+    считается; cooldown - минимальная пауза между срабатываниями в секундах.
+    'hotkey' и 'increment_counter' срабатывают только когда шаблон появился:
+    пока он остается на экране (например, гаснущее уведомление совпадает на
+    нескольких тиках подряд), повтора нет.
+    """
+    # Действия, которые выполняются один раз на появление шаблона
+    EDGE_ACTIONS = ('hotkey', 'increment_counter')
+
+    def __init__(self, template, action='click', keys='', cooldown=0.0, region=None, enabled=True):
+        if action not in ACTIONS:
+            raise ValueError(f'Неизвестное действие {action}')
+        self.template = template
+        self.action = action
+        self.keys = keys
+        self.cooldown = cooldown
+        self.region = tuple(region) if region else None
+        self.enabled = enabled
+        self.last_fired = None
+
+    def contains(self, x, y):
+        if self.region is None:
+            return True
+        rx, ry, rw, rh = self.region
+        return rx <= x < rx + rw and ry <= y < ry + rh
+
+    def ready(self, now):
+        return self.last_fired is None or now - self.last_fired >= self.cooldown
+
+    def to_dict(self):
+        return {
+            'template': self.template,
+            'action': self.action,
+            'keys': self.keys,
+            'cooldown': self.cooldown,
+            'region': list(self.region) if self.region else None,
+            'enabled': self.enabled
+        }
+
+
+class RuleEngine:
+    """Правила из data/rules.json, проверяются по попаданиям одного тика.
+
+    Правила сгруппированы по шаблону, так что проверка стоит O(число
+    попаданий), а не O(число правил). Шаблон без правил кликается, когда
+    появился, а пока остается на экране - не чаще DEFAULT_CLICK_COOLDOWN
+    (на случай, если клик не сработал). За тик выполняется не больше одного клика - по первому в порядке
+    приоритета шаблонов; горячие клавиши и счетчик срабатывают все, но
+    только на тике, где шаблон появился.
+    """
+
+    def __init__(self, rules_file):
+        self.rules_file = rules_file
+        self.rules = []
+        self._by_template = {}
+        # Правила клика для шаблонов без правил: хранят время последнего клика
+        self._defaults = {}
+        self.load()
+
+    def load(self):
+        self.rules = []
+        self._defaults = {}
+        try:
+            with open(self.rules_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            items = []
+        except json.JSONDecodeError as e:
+            print(f'Ошибка: файл {self.rules_file} поврежден: {e}')
+            items = []
+        for item in items:
+            try:
+                self.rules.append(Rule(item['template'], item.get('action', 'click'), item.get('keys', ''),
+                                       item.get('cooldown', 0.0), item.get('region'), item.get('enabled', True)))
+            except (KeyError, ValueError) as e:
+                print(f'Ошибка в правиле {item}: {e}')
+        self._index()
+
+    def save(self):
+        try:
+            with open(self.rules_file, 'w', encoding='utf-8') as f:
+                json.dump([rule.to_dict() for rule in self.rules], f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            print(f'Ошибка сохранения {self.rules_file}: {e}')
+
+    def add(self, rule):
+        self.rules.append(rule)
+        self._index()
+        self.save()
+
+    def _index(self):
+        self._by_template = {}
+        for rule in self.rules:
+            self._by_template.setdefault(rule.template, []).append(rule)
+
+    def evaluate(self, hits, now):
+        """hits - [(template, click_x, click_y, appeared)] в порядке приоритета.
+
+        appeared - шаблон появился на этом тике (TemplateEntry.appeared).
+
+        Возвращает правила, которые нужно выполнить сейчас: [(rule, x, y)].
+        """
+        fired = []
+        clicked = False
+        for template, x, y, appeared in hits:
+            rules = self._by_template.get(template)
+            if rules is None:
+                rule = self._defaults.get(template)
+                if rule is None:
+                    rule = self._defaults[template] = Rule(template, cooldown=DEFAULT_CLICK_COOLDOWN)
+                # Видимый шаблон совпадает и на следующих тиках (например, когда область
+                # захвата сужается до окна поиска): повторный клик только после паузы
+                if not clicked and (appeared or rule.ready(now)):
+                    rule.last_fired = now
+                    fired.append((rule, x, y))
+                    clicked = True
+                continue
+            for rule in rules:
+                if not rule.enabled or not rule.contains(x, y) or not rule.ready(now):
+                    continue
+                if rule.action in Rule.EDGE_ACTIONS and not appeared:
+                    continue
+                if rule.action == 'click':
+                    if clicked:
+                        continue
+                    clicked = True
+                rule.last_fired = now
+                fired.append((rule, x, y))
+        return fired
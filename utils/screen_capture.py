@@ -0,0 +1,363 @@
+import os
+import sys
+import time
+import ctypes
+import ctypes.util
+import cv2
+import numpy as np
+
+
+class CaptureBackend:
+    """Захват области экрана сразу в оттенках серого в переиспользуемый буфер.
+
+    grab() возвращает представление внутреннего буфера: оно действительно до
+    следующего вызова grab(), поэтому кадр нужно обработать (или скопировать) сразу.
+    Если передан out (uint8, h x w, C-порядок), кадр пишется в него.
+    convert_time - секунды на перевод в оттенки серого в последнем grab().
+    shared - grab() без out отдает кадры общего кольца только для чтения,
+    свой буфер вызывающему не нужен.
+    """
+    name = 'base'
+    shared = False
+
+    def __init__(self):
+        self._gray = np.empty(0, dtype=np.uint8)
+        self.convert_time = 0.0
+
+    def _to_gray(self, image, code, gray):
+        started = time.perf_counter()
+        cv2.cvtColor(image, code, dst=gray)
+        self.convert_time = time.perf_counter() - started
+
+    def screen_size(self):
+        raise NotImplementedError
+
+    def monitors(self):
+        """Прямоугольники мониторов (x, y, w, h) в координатах виртуального рабочего стола."""
+        return [(0, 0) + tuple(self.screen_size())]
+
+    def begin_frame(self, regions=None):
+        """Вызывается в начале тика, перед grab() всех его областей; regions - области тика."""
+        pass
+
+    def grab(self, region=None, out=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _gray_view(self, width, height, out=None):
+        if out is not None:
+            if out.shape != (height, width):
+                raise ValueError(f'Буфер {out.shape} не подходит для кадра {(height, width)}')
+            return out
+        size = width * height
+        if self._gray.size < size:
+            self._gray = np.empty(size, dtype=np.uint8)
+        return self._gray[:size].reshape(height, width)
+
+    def _full_region(self, region):
+        if region is None:
+            width, height = self.screen_size()
+            return 0, 0, width, height
+        return tuple(int(v) for v in region)
+
+
+class PyAutoGuiCaptureBackend(CaptureBackend):
+    """Запасной вариант: скриншот pyautogui, серый кадр пишется в общий буфер."""
+    name = 'pyautogui'
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def screen_size(self):
+        return tuple(self._pyautogui.size())
+
+    def monitors(self):
+        if sys.platform == 'win32':
+            monitors = _windows_monitors()
+            if monitors:
+                return monitors
+        return super().monitors()
+
+    def grab(self, region=None, out=None):
+        x, y, w, h = self._full_region(region)
+        screen_w, screen_h = self.screen_size()
+        if sys.platform == 'win32' and (x < 0 or y < 0 or x + w > screen_w or y + h > screen_h):
+            # pyautogui снимает только основной монитор; остальные - через PIL по всему рабочему столу
+            from PIL import ImageGrab
+            image = ImageGrab.grab(bbox=(x, y, x + w, y + h), all_screens=True)
+        else:
+            image = self._pyautogui.screenshot(region=(x, y, w, h))
+        rgb = np.asarray(image)
+        gray = self._gray_view(rgb.shape[1], rgb.shape[0], out)
+        self._to_gray(rgb, cv2.COLOR_RGB2GRAY, gray)
+        return gray
+
+
+def _windows_monitors():
+    """Мониторы через EnumDisplayMonitors; пустой список, если перечислить не удалось."""
+    from ctypes import wintypes
+    monitors = []
+
+    def callback(hmonitor, hdc, rect, data):
+        r = rect.contents
+        monitors.append((r.left, r.top, r.right - r.left, r.bottom - r.top))
+        return 1
+
+    enum_proc = ctypes.WINFUNCTYPE(ctypes.c_int, wintypes.HMONITOR, wintypes.HDC,
+                                   ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+    try:
+        ctypes.windll.user32.EnumDisplayMonitors(None, None, enum_proc(callback), 0)
+    except OSError as e:
+        print(f'Ошибка перечисления мониторов: {e}')
+        return []
+    return monitors
+
+
+class _XImage(ctypes.Structure):
+    # Нужны только первые поля структуры XImage из Xlib.h
+    _fields_ = [
+        ('width', ctypes.c_int), ('height', ctypes.c_int), ('xoffset', ctypes.c_int),
+        ('format', ctypes.c_int), ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int),
+        ('bitmap_unit', ctypes.c_int), ('bitmap_bit_order', ctypes.c_int), ('bitmap_pad', ctypes.c_int),
+        ('depth', ctypes.c_int), ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int),
+        ('red_mask', ctypes.c_ulong), ('green_mask', ctypes.c_ulong), ('blue_mask', ctypes.c_ulong),
+    ]
+
+
+class _XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int),
+        ('shmaddr', ctypes.c_void_p), ('readOnly', ctypes.c_int),
+    ]
+
+
+class _XRRMonitorInfo(ctypes.Structure):
+    _fields_ = [
+        ('name', ctypes.c_ulong), ('primary', ctypes.c_int), ('automatic', ctypes.c_int),
+        ('noutput', ctypes.c_int), ('x', ctypes.c_int), ('y', ctypes.c_int),
+        ('width', ctypes.c_int), ('height', ctypes.c_int), ('mwidth', ctypes.c_int),
+        ('mheight', ctypes.c_int), ('outputs', ctypes.c_void_p),
+    ]
+
+
+_XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+class X11CaptureBackend(CaptureBackend):
+    """Захват через MIT-SHM (XShmGetImage) в сегмент разделяемой памяти размером с экран.
+
+    Без расширения MIT-SHM (например, удаленный X-сервер) используется XGetImage.
+    Пиксели BGRA читаются прямо из сегмента и переводятся в серый в общий буфер.
+    """
+    name = 'x11'
+    Z_PIXMAP = 2
+    ALL_PLANES = 0xFFFFFFFF
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+
+    def __init__(self):
+        super().__init__()
+        if not os.environ.get('DISPLAY'):
+            raise OSError('DISPLAY не задан')
+        self._xlib = self._load('X11')
+        self._xlib.XOpenDisplay.restype = ctypes.c_void_p
+        self._xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self._xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._xlib.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        self._xlib.XDefaultVisual.restype = ctypes.c_void_p
+        self._xlib.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._xlib.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._xlib.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._xlib.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._xlib.XGetImage.restype = ctypes.POINTER(_XImage)
+        self._xlib.XGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                                         ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int]
+        self._xlib.XDestroyImage.argtypes = [ctypes.POINTER(_XImage)]
+        self._xlib.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self._xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self._xlib.XSetErrorHandler.restype = ctypes.c_void_p
+        self._xlib.XSetErrorHandler.argtypes = [_XErrorHandler]
+
+        self._display = self._xlib.XOpenDisplay(None)
+        if not self._display:
+            raise OSError('Не удалось подключиться к X-серверу')
+        # Стандартный обработчик ошибок Xlib завершает процесс, поэтому ставим свой
+        self._x_error = False
+        self._error_handler = _XErrorHandler(self._on_x_error)
+        self._xlib.XSetErrorHandler(self._error_handler)
+        screen = self._xlib.XDefaultScreen(self._display)
+        self._root = self._xlib.XDefaultRootWindow(self._display)
+        self._visual = self._xlib.XDefaultVisual(self._display, screen)
+        self._depth = self._xlib.XDefaultDepth(self._display, screen)
+        self._size = (self._xlib.XDisplayWidth(self._display, screen),
+                      self._xlib.XDisplayHeight(self._display, screen))
+        self._shm_images = {}
+        self._shminfo = None
+        try:
+            self._init_shm()
+        except OSError as e:
+            print(f'MIT-SHM недоступен, используется XGetImage: {e}')
+            self._shminfo = None
+
+    @staticmethod
+    def _load(name):
+        path = ctypes.util.find_library(name)
+        if not path:
+            raise OSError(f'Библиотека {name} не найдена')
+        return ctypes.CDLL(path)
+
+    def _on_x_error(self, display, event):
+        self._x_error = True
+        return 0
+
+    def _init_shm(self):
+        self._xext = self._load('Xext')
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        self._xext.XShmCreateImage.restype = ctypes.POINTER(_XImage)
+        self._xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                               ctypes.c_char_p, ctypes.POINTER(_XShmSegmentInfo),
+                                               ctypes.c_uint, ctypes.c_uint]
+        self._xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        self._xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XShmSegmentInfo)]
+        self._xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XImage),
+                                            ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        self._libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        self._libc.shmat.restype = ctypes.c_void_p
+        self._libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        self._libc.shmdt.argtypes = [ctypes.c_void_p]
+        self._libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+        if not self._xext.XShmQueryExtension(self._display):
+            raise OSError('расширение MIT-SHM не поддерживается')
+
+        # Один сегмент на весь экран, в него пишутся захваты любых подобластей
+        width, height = self._size
+        shminfo = _XShmSegmentInfo()
+        shmid = self._libc.shmget(self.IPC_PRIVATE, width * height * 4, self.IPC_CREAT | 0o600)
+        if shmid < 0:
+            raise OSError(ctypes.get_errno(), 'shmget')
+        shmaddr = self._libc.shmat(shmid, None, 0)
+        if shmaddr in (None, ctypes.c_void_p(-1).value):
+            self._libc.shmctl(shmid, self.IPC_RMID, None)
+            raise OSError(ctypes.get_errno(), 'shmat')
+        shminfo.shmid = shmid
+        shminfo.shmaddr = shmaddr
+        shminfo.readOnly = 0
+        self._x_error = False
+        self._xext.XShmAttach(self._display, ctypes.byref(shminfo))
+        self._xlib.XSync(self._display, 0)
+        # Сегмент удалится сам, когда от него отключатся и X-сервер, и мы
+        self._libc.shmctl(shmid, self.IPC_RMID, None)
+        if self._x_error:
+            self._libc.shmdt(shmaddr)
+            raise OSError('XShmAttach завершился ошибкой')
+        self._shminfo = shminfo
+
+    def screen_size(self):
+        return self._size
+
+    def monitors(self):
+        """Мониторы через XRandR; корневое окно X11 покрывает их все, поэтому захват идет из него же."""
+        try:
+            xrandr = self._load('Xrandr')
+        except OSError:
+            return super().monitors()
+        xrandr.XRRGetMonitors.restype = ctypes.POINTER(_XRRMonitorInfo)
+        xrandr.XRRGetMonitors.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
+                                          ctypes.POINTER(ctypes.c_int)]
+        xrandr.XRRFreeMonitors.argtypes = [ctypes.POINTER(_XRRMonitorInfo)]
+        count = ctypes.c_int(0)
+        info = xrandr.XRRGetMonitors(self._display, self._root, 1, ctypes.byref(count))
+        if not info:
+            return super().monitors()
+        try:
+            monitors = [(info[i].x, info[i].y, info[i].width, info[i].height) for i in range(count.value)]
+        finally:
+            xrandr.XRRFreeMonitors(info)
+        return monitors or super().monitors()
+
+    def _shm_image(self, width, height):
+        """Заголовок XImage нужного размера поверх общего сегмента и BGRA-представление его пикселей."""
+        key = (width, height)
+        cached = self._shm_images.get(key)
+        if cached is None:
+            if len(self._shm_images) >= 8:
+                self._destroy_shm_images()
+            image = self._xext.XShmCreateImage(self._display, self._visual, self._depth, self.Z_PIXMAP,
+                                               None, ctypes.byref(self._shminfo), width, height)
+            if not image or image.contents.bits_per_pixel != 32:
+                raise OSError('Поддерживается только 32-битный цвет')
+            image.contents.data = self._shminfo.shmaddr
+            cached = (image, self._bgra_view(image.contents))
+            self._shm_images[key] = cached
+        return cached
+
+    @staticmethod
+    def _bgra_view(ximage):
+        buffer = (ctypes.c_ubyte * (ximage.bytes_per_line * ximage.height)).from_address(ximage.data)
+        rows = np.frombuffer(buffer, dtype=np.uint8).reshape(ximage.height, ximage.bytes_per_line)
+        return rows[:, :ximage.width * 4].reshape(ximage.height, ximage.width, 4)
+
+    def grab(self, region=None, out=None):
+        x, y, w, h = self._full_region(region)
+        gray = self._gray_view(w, h, out)
+        self._x_error = False
+        if self._shminfo is not None:
+            image, bgra = self._shm_image(w, h)
+            ok = self._xext.XShmGetImage(self._display, self._root, image, x, y, self.ALL_PLANES)
+            if not ok or self._x_error:
+                raise OSError(f'XShmGetImage не смог захватить область {(x, y, w, h)}')
+            self._to_gray(bgra, cv2.COLOR_BGRA2GRAY, gray)
+            return gray
+        image = self._xlib.XGetImage(self._display, self._root, x, y, w, h, self.ALL_PLANES, self.Z_PIXMAP)
+        if not image or self._x_error:
+            raise OSError(f'XGetImage не смог захватить область {(x, y, w, h)}')
+        try:
+            if image.contents.bits_per_pixel != 32:
+                raise OSError('Поддерживается только 32-битный цвет')
+            self._to_gray(self._bgra_view(image.contents), cv2.COLOR_BGRA2GRAY, gray)
+        finally:
+            self._xlib.XDestroyImage(image)
+        return gray
+
+    def _destroy_shm_images(self):
+        for image, _ in self._shm_images.values():
+            # Для SHM-изображений XDestroyImage освобождает только заголовок
+            self._xlib.XDestroyImage(image)
+        self._shm_images = {}
+
+    def close(self):
+        if not self._display:
+            return
+        self._destroy_shm_images()
+        if self._shminfo is not None:
+            self._xext.XShmDetach(self._display, ctypes.byref(self._shminfo))
+            self._xlib.XSync(self._display, 0)
+            self._libc.shmdt(self._shminfo.shmaddr)
+            self._shminfo = None
+        self._xlib.XCloseDisplay(self._display)
+        self._display = None
+
+
+CAPTURE_BACKENDS = {
+    'x11': X11CaptureBackend,
+    'pyautogui': PyAutoGuiCaptureBackend,
+}
+
+
+def create_capture_backend(name='auto'):
+    """Создает бэкенд по имени; 'auto' - X11 на Linux, иначе pyautogui."""
+    if name != 'auto':
+        return CAPTURE_BACKENDS[name]()
+    if sys.platform.startswith('linux'):
+        try:
+            return X11CaptureBackend()
+        except OSError as e:
+            print(f'X11-захват недоступен, используется pyautogui: {e}')
+    return PyAutoGuiCaptureBackend()
@@ -276,4 +276,13 @@ DATE_LABEL_STYLE = """
         font-size: 10pt;
         font-family: 'SF Pro Text', 'Helvetica Neue', sans-serif;
     }
-"""
\ No newline at end of file
+"""
+
+TELEMETRY_LABEL_STYLE = """
+    QLabel {
+        background-color: transparent;
+        color: #8E8E93;
+        font-size: 7pt;
+        font-family: 'SF Pro Text', 'Helvetica Neue', sans-serif;
+    }
+"""
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import shutil
+from utils.template_matcher import PyramidMatcher
+from utils.template_store import TemplateStore
+
+
+class TemplateEntry:
+    """Именованный шаблон кнопки со своим порогом и смещением клика.
+
+    Для каждого масштаба из scales (1.25 - кнопка на экране в 1.25 раза больше
+    исходной картинки) держится свой матчер. Уровни пирамид берутся из
+    TemplateStore, так что при перезапуске картинка не декодируется заново.
+    После первого попадания шаблон фиксируется на выигравшем масштабе и
+    дальше сравнивается только в нем. Фиксация снимается промахами (см.
+    MatchEngine.step), например после смены зума. Без фиксации шаблон
+    сравнивается в preferred_scale, а во всех масштабах - только когда
+    движок выставил search_all_scales.
+    """
+
+    def __init__(self, name, path, store, threshold=0.8, offset=(0, 0), enabled=True, pyramid_levels=2,
+                 scales=(1.0,)):
+        self.name = name
+        self.path = path
+        self.threshold = threshold
+        self.offset = tuple(offset)
+        self.enabled = enabled
+        self.matchers = {}
+        self.prepared = store.get(path, scales, pyramid_levels)
+        if self.prepared is not None:
+            for scale, pyramid in self.prepared.pyramids.items():
+                if self.prepared.is_flat(scale):
+                    print(f'Шаблон {name} однотонный в масштабе {scale}, пропущен')
+                    continue
+                self.matchers[scale] = PyramidMatcher(pyramid[0], pyramid=pyramid)
+        self.locked_scale = None
+        # Масштаб без фиксации: прошлый зафиксированный, сначала ближайший к 1.0
+        self.preferred_scale = min(self.matchers, key=lambda s: abs(s - 1.0)) if self.matchers else None
+        # Промахи подряд в зафиксированном масштабе
+        self.scale_misses = 0
+        # Поиск во всех масштабах на этом тике и time.perf_counter(), раньше которого он не нужен
+        self.search_all_scales = False
+        self.next_scale_search = 0.0
+        # Последнее найденное место (x, y) в координатах экрана
+        self.last_hit = None
+        self.window_misses = 0
+        # Шаблон сейчас на экране: с последнего попадания его место еще не изменилось
+        # без попадания. appeared - попадание на этом тике было первым после отсутствия
+        self.visible = False
+        self.appeared = False
+
+    @property
+    def loaded(self):
+        return bool(self.matchers)
+
+    @property
+    def shape(self):
+        """Размер шаблона в выбранном масштабе, а до фиксации - наибольший из масштабов."""
+        if self.locked_scale is not None:
+            return self.matchers[self.locked_scale].shape
+        shapes = [m.shape for m in self.matchers.values()]
+        return max(h for h, _ in shapes), max(w for _, w in shapes)
+
+    def reset_scale(self):
+        """Снимает фиксацию масштаба; следующий измененный кадр ищется во всех масштабах."""
+        if self.locked_scale is not None:
+            self.preferred_scale = self.locked_scale
+        self.locked_scale = None
+        self.scale_misses = 0
+        self.next_scale_search = 0.0
+
+    def match(self, frame, pyramid=None):
+        """Возвращает (score, (x, y), scale) лучшего совпадения среди активных масштабов."""
+        if self.locked_scale is not None:
+            candidates = [(self.locked_scale, self.matchers[self.locked_scale])]
+        elif self.search_all_scales:
+            candidates = self.matchers.items()
+        else:
+            candidates = [(self.preferred_scale, self.matchers[self.preferred_scale])]
+        best = (-1.0, (0, 0), None)
+        for scale, matcher in candidates:
+            th, tw = matcher.shape
+            if frame.shape[0] < th or frame.shape[1] < tw:
+                continue
+            score, loc = matcher.match(frame, pyramid)
+            if score > best[0]:
+                best = (score, loc, scale)
+        return best
+
+    def register_hit(self, x, y, scale):
+        self.appeared = not self.visible
+        self.visible = True
+        self.last_hit = (x, y)
+        self.window_misses = 0
+        self.locked_scale = scale
+        self.scale_misses = 0
+
+    def click_point(self, x, y):
+        """Точка клика для совпадения с левым верхним углом (x, y)."""
+        th, tw = self.shape
+        return x + tw // 2 + self.offset[0], y + th // 2 + self.offset[1]
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'file': os.path.basename(self.path),
+            'threshold': self.threshold,
+            'offset': list(self.offset),
+            'enabled': self.enabled
+        }
+
+
+class TemplateLibrary:
+    """Библиотека шаблонов, хранится в data/templates.json и data/templates/,
+    предобработанные формы - в data/template_cache/.
+
+    Порядок шаблонов задает приоритет: за один кадр кликается первый найденный.
+    """
+
+    def __init__(self, library_file, templates_dir, pyramid_levels=2, scales=(1.0,)):
+        self.library_file = library_file
+        self.templates_dir = templates_dir
+        self.pyramid_levels = pyramid_levels
+        self.scales = tuple(scales)
+        self.entries = []
+        os.makedirs(self.templates_dir, exist_ok=True)
+        self.store = TemplateStore(os.path.join(os.path.dirname(self.library_file), 'template_cache'))
+        self.load()
+
+    def load(self):
+        self.entries = []
+        try:
+            with open(self.library_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except FileNotFoundError:
+            return
+        except json.JSONDecodeError as e:
+            print(f'Ошибка: файл {self.library_file} поврежден: {e}')
+            return
+        for item in items:
+            entry = TemplateEntry(item['name'], os.path.join(self.templates_dir, item['file']), self.store,
+                                  item.get('threshold', 0.8), item.get('offset', (0, 0)),
+                                  item.get('enabled', True), self.pyramid_levels, self.scales)
+            if not entry.loaded:
+                print(f'Ошибка: не удалось загрузить шаблон {entry.path}')
+            self.entries.append(entry)
+
+    def save(self):
+        try:
+            with open(self.library_file, 'w', encoding='utf-8') as f:
+                json.dump([entry.to_dict() for entry in self.entries], f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            print(f'Ошибка сохранения {self.library_file}: {e}')
+        self.store.prune({entry.prepared.key for entry in self.entries if entry.prepared})
+
+    @staticmethod
+    def file_stem(name):
+        """Имя файла для шаблона: name без разделителей пути и других недопустимых символов."""
+        stem = re.sub(r'[^\w\- ]', '_', name).strip()
+        return stem or 'template'
+
+    def add(self, name, source_path, threshold=0.8, offset=(0, 0)):
+        """Копирует изображение в библиотеку; шаблон с тем же именем заменяется.
+
+        Картинка сначала копируется во временный файл и проверяется, старый
+        файл заменяется только если новая загрузилась. Иначе возвращается None,
+        а прежний шаблон остается как был.
+        """
+        ext = os.path.splitext(source_path)[1].lower() or '.png'
+        stem = self.file_stem(name)
+        # Разные имена могут дать одно имя файла ('a/b' и 'a_b'): чужой файл не трогаем
+        taken = {os.path.abspath(e.path) for e in self.entries if e.name != name}
+        target = os.path.join(self.templates_dir, f'{stem}{ext}')
+        suffix = 1
+        while os.path.abspath(target) in taken:
+            suffix += 1
+            target = os.path.join(self.templates_dir, f'{stem}_{suffix}{ext}')
+        if os.path.abspath(source_path) == os.path.abspath(target):
+            candidate = target
+        else:
+            candidate = os.path.join(self.templates_dir, f'.{stem}.tmp{ext}')
+            shutil.copyfile(source_path, candidate)
+        entry = TemplateEntry(name, candidate, self.store, threshold, offset, True, self.pyramid_levels, self.scales)
+        if not entry.loaded:
+            if candidate != target:
+                os.remove(candidate)
+            return None
+        if candidate != target:
+            os.replace(candidate, target)
+            entry.path = target
+        old = self.get(name)
+        if old is not None and os.path.abspath(old.path) != os.path.abspath(target) and os.path.exists(old.path):
+            os.remove(old.path)
+        self.entries = [e for e in self.entries if e.name != name]
+        self.entries.append(entry)
+        self.save()
+        return entry
+
+    def remove(self, name):
+        self.entries = [e for e in self.entries if e.name != name]
+        self.save()
+
+    def get(self, name):
+        return next((e for e in self.entries if e.name == name), None)
+
+    def active(self):
+        return [e for e in self.entries if e.enabled and e.loaded]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
@@ -0,0 +1,100 @@
+import cv2
+
+
+class FramePyramid:
+    """Уменьшенные копии кадра, которые строятся по требованию и общие для всех шаблонов."""
+
+    def __init__(self, frame):
+        self.levels = [frame]
+
+    def level(self, n):
+        while len(self.levels) <= n:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        return self.levels[n]
+
+
+def build_template_pyramid(template, levels=2, min_template_side=12):
+    """Уровни шаблона [исходный, pyrDown, ...], пока меньшая сторона не меньше min_template_side."""
+    templates = [template]
+    for _ in range(levels):
+        smaller = cv2.pyrDown(templates[-1])
+        if min(smaller.shape[:2]) < min_template_side:
+            break
+        templates.append(smaller)
+    return templates
+
+
+class PyramidMatcher:
+    """Поиск шаблона от грубого к точному.
+
+    Уменьшенные копии шаблона строятся один раз при создании. На каждом кадре
+    уменьшенный скриншот сравнивается с уменьшенным шаблоном, а на полном
+    разрешении перепроверяются только top_k лучших кандидатов, поэтому порог
+    по-прежнему относится к полноразмерному TM_CCOEFF_NORMED.
+    """
+
+    def __init__(self, template, levels=2, top_k=3, min_template_side=12, refine_margin=4, pyramid=None):
+        # pyramid - готовые уровни шаблона (например, из TemplateStore), чтобы не строить их заново
+        if pyramid is None:
+            pyramid = build_template_pyramid(template, levels, min_template_side)
+        self.templates = list(pyramid)
+        self.template = self.templates[0]
+        self.top_k = top_k
+        self.refine_margin = refine_margin
+        self.levels = len(self.templates) - 1
+
+    @property
+    def shape(self):
+        return self.template.shape[:2]
+
+    def match(self, frame, pyramid=None):
+        """Возвращает (score, (x, y)) лучшего совпадения в координатах кадра.
+
+        pyramid - FramePyramid этого же кадра, чтобы не уменьшать кадр заново для каждого шаблона.
+        """
+        th, tw = self.shape
+        fh, fw = frame.shape[:2]
+        if fh < th or fw < tw:
+            return -1.0, (0, 0)
+        # На маленьких кадрах (окно поиска) пирамида не окупается
+        if self.levels == 0 or fh * fw < 16 * th * tw:
+            return self._match_full(frame)
+
+        if pyramid is None:
+            pyramid = FramePyramid(frame)
+        small = pyramid.level(self.levels)
+        small_template = self.templates[self.levels]
+        if small.shape[0] < small_template.shape[0] or small.shape[1] < small_template.shape[1]:
+            return self._match_full(frame)
+        coarse = cv2.matchTemplate(small, small_template, cv2.TM_CCOEFF_NORMED)
+
+        factor = 1 << self.levels
+        radius = factor + self.refine_margin
+        best_score, best_loc = -1.0, (0, 0)
+        for cx, cy in self._top_candidates(coarse, small_template.shape[:2]):
+            x0 = max(0, cx * factor - radius)
+            y0 = max(0, cy * factor - radius)
+            x1 = min(fw, cx * factor + tw + radius)
+            y1 = min(fh, cy * factor + th + radius)
+            score, (x, y) = self._match_full(frame[y0:y1, x0:x1])
+            if score > best_score:
+                best_score, best_loc = score, (x0 + x, y0 + y)
+        return best_score, best_loc
+
+    def _match_full(self, frame):
+        result = cv2.matchTemplate(frame, self.template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+    def _top_candidates(self, result, template_shape):
+        """top_k максимумов грубой карты с подавлением соседей в пределах шаблона."""
+        th, tw = template_shape
+        result = result.copy()
+        candidates = []
+        for _ in range(self.top_k):
+            _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+            if max_val <= -1.0:
+                break
+            candidates.append((x, y))
+            result[max(0, y - th // 2):y + th // 2 + 1, max(0, x - tw // 2):x + tw // 2 + 1] = -1.0
+        return candidates
@@ -0,0 +1,132 @@
+import os
+import json
+import hashlib
+import cv2
+import numpy as np
+from utils.template_matcher import build_template_pyramid
+
+
+class PreparedTemplate:
+    """Предобработанный шаблон: уровни пирамиды и mean/std для каждого масштаба."""
+
+    def __init__(self, key, pyramids, stats):
+        self.key = key
+        # {scale: [уровень 0, уровень 1, ...]}
+        self.pyramids = pyramids
+        # {scale: [(mean, std) для каждого уровня]}
+        self.stats = stats
+
+    def is_flat(self, scale, min_std=1.0):
+        """Однотонный шаблон: TM_CCOEFF_NORMED для него не определен."""
+        return self.stats[scale][0][1] < min_std
+
+
+class TemplateStore:
+    """Кэш предобработанных шаблонов в data/template_cache/<sha1>.npz.
+
+    Ключ - хэш содержимого картинки и параметров предобработки, поэтому при
+    перезапуске картинка не декодируется и пирамиды не строятся заново, а
+    измененный файл сам получает новый ключ.
+    """
+    VERSION = 1
+
+    def __init__(self, cache_dir, min_side=8, min_template_side=12):
+        self.cache_dir = cache_dir
+        self.min_side = min_side
+        self.min_template_side = min_template_side
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, path, scales, levels):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        params = f'{self.VERSION}:{sorted(scales)}:{levels}:{self.min_side}:{self.min_template_side}'
+        digest.update(params.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def get(self, path, scales, levels):
+        """PreparedTemplate для картинки или None, если ее не удалось прочитать."""
+        try:
+            key = self.key(path, scales, levels)
+        except OSError:
+            return None
+        prepared = self._load(key)
+        if prepared is None:
+            prepared = self._build(key, path, scales, levels)
+            if prepared is not None:
+                self._save(prepared)
+        return prepared
+
+    def _load(self, key):
+        cache_path = self._cache_path(key)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                pyramids, stats = {}, {}
+                for i, scale in enumerate(meta['scales']):
+                    pyramids[scale] = [data[f's{i}_l{level}'] for level in range(meta['levels'][i])]
+                    stats[scale] = [tuple(pair) for pair in meta['stats'][i]]
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Ошибка чтения кэша шаблона {cache_path}: {e}')
+            return None
+        return PreparedTemplate(key, pyramids, stats)
+
+    def _build(self, key, path, scales, levels):
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            return None
+        pyramids, stats = {}, {}
+        h, w = image.shape[:2]
+        for scale in scales:
+            if scale == 1.0:
+                scaled = image
+            else:
+                size = (round(w * scale), round(h * scale))
+                if min(size) < self.min_side:
+                    continue
+                interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                scaled = cv2.resize(image, size, interpolation=interpolation)
+            pyramid = build_template_pyramid(scaled, levels, self.min_template_side)
+            pyramids[scale] = pyramid
+            stats[scale] = [self._mean_std(level) for level in pyramid]
+        return PreparedTemplate(key, pyramids, stats)
+
+    @staticmethod
+    def _mean_std(image):
+        mean, std = cv2.meanStdDev(image)
+        return float(mean[0, 0]), float(std[0, 0])
+
+    def _save(self, prepared):
+        scales = list(prepared.pyramids)
+        arrays = {}
+        for i, scale in enumerate(scales):
+            for level, array in enumerate(prepared.pyramids[scale]):
+                arrays[f's{i}_l{level}'] = array
+        meta = {
+            'scales': scales,
+            'levels': [len(prepared.pyramids[scale]) for scale in scales],
+            'stats': [prepared.stats[scale] for scale in scales]
+        }
+        cache_path = self._cache_path(prepared.key)
+        tmp_path = cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f'Ошибка сохранения кэша шаблона {cache_path}: {e}')
+
+    def prune(self, keep_keys):
+        """Удаляет кэш шаблонов, которых больше нет в библиотеке."""
+        for file_name in os.listdir(self.cache_dir):
+            key, ext = os.path.splitext(file_name)
+            if ext == '.npz' and key not in keep_keys:
+                try:
+                    os.remove(os.path.join(self.cache_dir, file_name))
+                except OSError as e:
+                    print(f'Ошибка удаления {file_name}: {e}')